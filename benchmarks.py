@@ -0,0 +1,560 @@
+"""
+Performance Benchmarks for the Customer Support Chatbot
+Micro-benchmarks for individual hot-path components
+
+Usage:
+    python benchmarks.py rules      # keyword matcher vs. the original nested loop
+    python benchmarks.py orders     # combined order-ID pattern vs. four searches
+    python benchmarks.py startup    # import and first-response time, ML vs. rule-only
+    python benchmarks.py inference  # pure-NumPy inference engine vs. scikit-learn
+    python benchmarks.py instrumentation  # get_response cost with and without sinks
+    python benchmarks.py retrieval  # nearest-exemplar lookup latency vs. index size
+    python benchmarks.py typos      # sentiment + keyword lookup cost of typo correction
+    python benchmarks.py suite --baseline bench_baseline.json
+                                    # per-stage timings; fails on regressions vs. the baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from chatbot import ConversationState, CustomerSupportBot, sentiment_scores
+from instrumentation import CounterSink, Instrumentation
+
+
+SAMPLE_MESSAGES = [
+    "Hello",
+    "hi there",
+    "Where is my order ORD12345?",
+    "I want a refund for my damaged product please",
+    "my package never came and nobody answers",
+    "Can I pay with a credit card?",
+    "cancel it",
+    "I want to speak to human right now",
+    "the quick brown fox jumps over the lazy dog",
+    "xyz qqq",
+    "The item arrived broken and the box was crushed, this is not what I expected "
+    "from a store I have used for years, please sort it out",
+]
+
+
+def _best_time_us(func, args, number, repeat):
+    """Best-of-repeat average time per call, in microseconds"""
+    timer = timeit.Timer(lambda: func(*args))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def _legacy_rule_based_intent(patterns, user_input):
+    """The original per-keyword substring loop, kept as the benchmark baseline"""
+    user_input = user_input.lower()
+    for intent, keywords in patterns.items():
+        for keyword in keywords:
+            if keyword in user_input:
+                return intent
+    return 'unknown'
+
+
+def _compile_alternation(patterns):
+    """Single-scan alternation regex; the lookahead reports overlapping hits"""
+    groups = "|".join(
+        f"(?P<i{priority}>{'|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))})"
+        for priority, keywords in enumerate(patterns.values())
+    )
+    return re.compile(f"(?=(?:{groups}))"), list(patterns)
+
+
+def _alternation_rule_based_intent(compiled, user_input):
+    regex, intents = compiled
+    best = None
+    for match in regex.finditer(user_input.lower()):
+        priority = int(match.lastgroup[1:])
+        if best is None or priority < best:
+            best = priority
+    return 'unknown' if best is None else intents[best]
+
+
+def bench_rule_matcher(number=2000, repeat=5):
+    """Compare the compiled keyword matcher with the original loop"""
+    print("\n" + "="*60)
+    print("🔎 RULE-BASED INTENT MATCHER BENCHMARK")
+    print("="*60 + "\n")
+
+    bot = CustomerSupportBot(use_ml=False)
+    alternation = _compile_alternation(bot.patterns)
+    for message in SAMPLE_MESSAGES:
+        expected = _legacy_rule_based_intent(bot.patterns, message)
+        assert bot._rule_based_intent(message) == expected, message
+        assert _alternation_rule_based_intent(alternation, message) == expected, message
+
+    keyword_count = sum(len(keywords) for keywords in bot.patterns.values())
+    print(f"Keywords: {keyword_count} in table, {len(bot._keyword_matcher.entries)} after compilation")
+    print(f"{'message':<32} {'loop µs':>9} {'compiled µs':>12} {'regex µs':>9}")
+    totals = [0.0, 0.0, 0.0]
+    for message in SAMPLE_MESSAGES:
+        timings = [
+            _best_time_us(_legacy_rule_based_intent, (bot.patterns, message), number, repeat),
+            _best_time_us(bot._rule_based_intent, (message,), number, repeat),
+            _best_time_us(_alternation_rule_based_intent, (alternation, message), number, repeat),
+        ]
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(f"{message[:32]:<32} {timings[0]:>9.2f} {timings[1]:>12.2f} {timings[2]:>9.2f}")
+    count = len(SAMPLE_MESSAGES)
+    print(f"{'average':<32} {totals[0]/count:>9.2f} {totals[1]/count:>12.2f} {totals[2]/count:>9.2f}")
+    print(f"\nCompiled matcher speedup over loop: {totals[0]/totals[1]:.2f}x")
+
+
+def _legacy_extract_order_id(user_input):
+    """The original four-search order ID extractor, kept as the benchmark baseline"""
+    patterns = [
+        r'[Oo][Rr][Dd]\d+',
+        r'#\d+',
+        r'order\s+(\d+)',
+        r'id\s+(\d+)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, user_input)
+        if match:
+            return match.group(0)
+    return None
+
+
+def bench_order_ids(count=200000):
+    """Compare batch order-ID extraction with the original per-message searches"""
+    print("\n" + "="*60)
+    print("🔢 ORDER ID EXTRACTION BENCHMARK")
+    print("="*60 + "\n")
+
+    bot = CustomerSupportBot(use_ml=False)
+    messages = (SAMPLE_MESSAGES * (count // len(SAMPLE_MESSAGES) + 1))[:count]
+    expected = [_legacy_extract_order_id(message) for message in SAMPLE_MESSAGES]
+    assert bot.extract_order_ids(SAMPLE_MESSAGES) == expected
+
+    legacy_time = min(timeit.repeat(lambda: [_legacy_extract_order_id(m) for m in messages], number=1, repeat=3))
+    batch_time = min(timeit.repeat(lambda: bot.extract_order_ids(messages), number=1, repeat=3))
+    print(f"Messages: {count}")
+    print(f"Four searches per message: {legacy_time:.3f}s ({count / legacy_time:,.0f} msg/s)")
+    print(f"extract_order_ids batch:   {batch_time:.3f}s ({count / batch_time:,.0f} msg/s)")
+    print(f"Speedup: {legacy_time / batch_time:.2f}x")
+
+
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import chatbot
+imported = time.perf_counter()
+bot = chatbot.CustomerSupportBot(use_ml={use_ml})
+ready = time.perf_counter()
+bot.get_response("Where is my order ORD12345?")
+answered = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'init_ms': (ready - imported) * 1000,
+    'first_response_ms': (answered - ready) * 1000,
+    'ml_modules_loaded': [m for m in ('numpy', 'scipy', 'sklearn') if m in sys.modules],
+}}))
+"""
+
+
+def bench_startup(runs=5):
+    """Time a fresh process importing the bot and answering its first message"""
+    print("\n" + "="*60)
+    print("🚀 STARTUP BENCHMARK")
+    print("="*60 + "\n")
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'mode':<10} {'process ms':>11} {'import ms':>10} {'init ms':>9} {'1st reply ms':>13}  modules loaded")
+    for mode, use_ml in (('rules', False), ('ml', True)):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-c', _STARTUP_PROBE.format(use_ml=use_ml)],
+                cwd=repo_dir, capture_output=True, text=True, check=True
+            ).stdout
+            sample = json.loads(output.strip().splitlines()[-1])
+            sample['process_ms'] = (time.perf_counter() - started) * 1000
+            samples.append(sample)
+        median = {key: statistics.median(s[key] for s in samples)
+                  for key in ('process_ms', 'import_ms', 'init_ms', 'first_response_ms')}
+        modules = ", ".join(samples[-1]['ml_modules_loaded']) or "none"
+        print(f"{mode:<10} {median['process_ms']:>11.1f} {median['import_ms']:>10.1f} "
+              f"{median['init_ms']:>9.1f} {median['first_response_ms']:>13.2f}  {modules}")
+    print(f"\n(median of {runs} fresh processes)")
+
+
+def bench_inference(number=500, repeat=5):
+    """Compare the pure-NumPy inference engine with scikit-learn's predict_proba"""
+    import numpy as np
+
+    print("\n" + "="*60)
+    print("🧮 INTENT INFERENCE BENCHMARK")
+    print("="*60 + "\n")
+
+    bot = CustomerSupportBot(use_ml=True)
+    vectorizer, classifier = bot.vectorizer, bot.intent_classifier
+    engine = bot.inference_engine
+    expected = classifier.predict_proba(vectorizer.transform(SAMPLE_MESSAGES))
+    max_error = np.abs(engine.predict_proba(SAMPLE_MESSAGES) - expected).max()
+    print(f"Max |engine - sklearn| probability difference: {max_error:.2e}\n")
+
+    def sklearn_predict(messages):
+        return classifier.predict_proba(vectorizer.transform(messages))
+
+    message = SAMPLE_MESSAGES[2]
+    single_sklearn = _best_time_us(sklearn_predict, ([message],), number, repeat)
+    single_engine = _best_time_us(engine.predict_proba, ([message],), number, repeat)
+    print(f"Single message:   sklearn {single_sklearn:8.1f} µs   engine {single_engine:8.1f} µs   "
+          f"speedup {single_sklearn / single_engine:.1f}x")
+
+    batch = SAMPLE_MESSAGES * 100
+    batch_number = max(1, number // 50)
+    batch_sklearn = _best_time_us(sklearn_predict, (batch,), batch_number, repeat) / len(batch)
+    batch_engine = _best_time_us(engine.predict_proba, (batch,), batch_number, repeat) / len(batch)
+    print(f"Batch of {len(batch)} (per msg): sklearn {batch_sklearn:6.1f} µs   engine {batch_engine:6.1f} µs   "
+          f"speedup {batch_sklearn / batch_engine:.1f}x")
+
+
+def bench_instrumentation(number=2000, repeat=5):
+    """get_response cost with no instrumentation, an empty one, and a counter sink"""
+    print("\n" + "="*60)
+    print("🔬 INSTRUMENTATION OVERHEAD BENCHMARK")
+    print("="*60 + "\n")
+
+    bot = CustomerSupportBot(use_ml=True)
+    messages = _messages(TURNS_PER_RUN)
+
+    def conversation(_):
+        bot.state = ConversationState()
+        for message in messages:
+            bot.get_response(message)
+
+    timings = {}
+    for label, instrumentation in (('none', None), ('no sinks', Instrumentation()),
+                                   ('counter sink', Instrumentation([CounterSink()]))):
+        bot.instrumentation = instrumentation
+        timings[label] = _time_stage(conversation, lambda: None, len(messages), 2, repeat,
+                                     max(1, number // (10 * len(messages))))['best_us']
+    for label, best_us in timings.items():
+        print(f"{label:<14} {best_us:8.2f} µs per get_response  ({best_us / timings['none'] - 1:+.1%})")
+
+
+# Retrieval benchmark: exemplar counts and the per-message latency budget
+RETRIEVAL_SIZES = (1000, 10000, 100000)
+RETRIEVAL_BUDGET_MS = 5.0
+
+
+def _synthetic_exemplars(count, seed=0):
+    """Labelled utterances made by recombining the training data's words within each intent"""
+    import random
+    from chatbot import TRAINING_DATA
+
+    rng = random.Random(seed)
+    words = {}
+    for text, intent in TRAINING_DATA:
+        words.setdefault(intent, []).extend(text.lower().split())
+    intents = sorted(words)
+    examples = []
+    for i in range(count):
+        intent = intents[i % len(intents)]
+        examples.append((" ".join(rng.choices(words[intent], k=rng.randint(3, 10))), intent))
+    return examples
+
+
+def bench_retrieval(sizes=RETRIEVAL_SIZES, budget_ms=RETRIEVAL_BUDGET_MS, repeat=5):
+    """Single-message and batched top-k lookup time as the exemplar index grows"""
+    from latency_histogram import LatencyHistogram
+    from retrieval_index import RetrievalIndex
+
+    print("\n" + "="*60)
+    print("🔎 RETRIEVAL FALLBACK BENCHMARK")
+    print("="*60 + "\n")
+
+    engine = CustomerSupportBot(use_ml=True).inference_engine
+    messages = _messages(TURNS_PER_RUN)
+    print(f"{'exemplars':>10} {'build ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'batch µs/msg':>13}")
+    within_budget = True
+    for size in sizes:
+        examples = _synthetic_exemplars(size)
+        started = time.perf_counter()
+        index = RetrievalIndex(engine, [text for text, _ in examples], [intent for _, intent in examples])
+        build_ms = (time.perf_counter() - started) * 1000
+
+        histogram = LatencyHistogram()
+        for _ in range(repeat):
+            for message in messages:
+                started = time.perf_counter_ns()
+                index.search([message], k=3)
+                histogram.record(time.perf_counter_ns() - started)
+        batch_us = _best_time_us(index.search, (messages, 3), 1, repeat) / len(messages)
+        summary = histogram.summary_ms()
+        status = "✓" if summary['p99_ms'] <= budget_ms else "⚠"
+        within_budget = within_budget and status == "✓"
+        print(f"{size:>10,} {build_ms:>9.1f} {summary['p50_ms']:>8.3f} {summary['p99_ms']:>8.3f} "
+              f"{batch_us:>13.1f}  {status}")
+    print(f"\n{'✓' if within_budget else '⚠'} p99 budget per message: {budget_ms:.1f} ms")
+    return within_budget
+
+
+MISSPELLED_MESSAGES = [
+    "this is frustating",
+    "i want a refnd",
+    "the box is dammaged",
+    "terible servise, very dissapointed",
+    "I want to speek to humna",
+]
+
+
+def bench_typos(number=2000, repeat=5):
+    """Per-message sentiment + keyword lookup time with and without the typo index"""
+    print("\n" + "="*60)
+    print("🔤 TYPO TOLERANCE BENCHMARK")
+    print("="*60 + "\n")
+
+    plain = CustomerSupportBot(use_ml=False)
+    tolerant = CustomerSupportBot(use_ml=False, typo_tolerance=True)
+    index = tolerant.typo_index
+    print(f"Index: {len(index)} words, {len(index.deletes)} delete variants\n")
+
+    def lookup(bot, messages):
+        for message in messages:
+            bot.detect_sentiment(message)
+            bot._rule_based_intent(message)
+
+    def cold_lookup(bot, messages):
+        index.correct.cache_clear()
+        lookup(bot, messages)
+
+    print(f"{'messages':<12} {'exact µs':>9} {'tolerant µs':>12} {'cold µs':>9} {'added µs':>9}")
+    for label, messages in (('clean', SAMPLE_MESSAGES), ('misspelled', MISSPELLED_MESSAGES)):
+        exact = _best_time_us(lookup, (plain, messages), number // 10, repeat) / len(messages)
+        warm = _best_time_us(lookup, (tolerant, messages), number // 10, repeat) / len(messages)
+        cold = _best_time_us(cold_lookup, (tolerant, messages), number // 10, repeat) / len(messages)
+        print(f"{label:<12} {exact:>9.2f} {warm:>12.2f} {cold:>9.2f} {cold - exact:>9.2f}")
+    for message in MISSPELLED_MESSAGES:
+        print(f"  '{message}' -> {tolerant.detect_sentiment(message)}, {tolerant._rule_based_intent(message)} "
+              f"(exact: {plain.detect_sentiment(message)}, {plain._rule_based_intent(message)})")
+
+
+# Stage-suite parameters: batch sizes for the stateless stages, and logged
+# conversation lengths for the per-turn (stateful) stages
+BATCH_SIZES = (1, 8, 32, 128)
+CONVERSATION_LENGTHS = (1, 10, 100, 1000)
+TURNS_PER_RUN = 32
+REGRESSION_THRESHOLD = 0.30
+
+
+def _messages(count):
+    return (SAMPLE_MESSAGES * (count // len(SAMPLE_MESSAGES) + 1))[:count]
+
+
+def _conversation_messages(bot, count):
+    """`count` distinct messages that cannot escalate a fresh conversation.
+
+    Messages that escalate on their own or are unclear (several unclear ones
+    escalate) are left out, and each is numbered so none counts as repeated.
+    """
+    usable = []
+    for message in SAMPLE_MESSAGES:
+        bot.state = ConversationState()
+        analysis = bot.analyze_turn(message)
+        if analysis.intent != 'unknown' and not bot.should_escalate_to_human(analysis)[0]:
+            usable.append(message)
+    return [f"#{i} {usable[i % len(usable)]}" for i in range(count)]
+
+
+def _time_stage(func, setup, items, warmup, repeat, number=1, setup_each=False):
+    """Time func(setup()) after warmup runs; returns µs per item (best and median).
+
+    With setup_each, every call gets its own (untimed) setup() instead of
+    each repeat sharing one.
+    """
+    for _ in range(warmup):
+        func(setup())
+    samples = []
+    for _ in range(repeat):
+        if setup_each:
+            elapsed = 0
+            for _ in range(number):
+                context = setup()
+                started = time.perf_counter_ns()
+                func(context)
+                elapsed += time.perf_counter_ns() - started
+        else:
+            context = setup()
+            started = time.perf_counter_ns()
+            for _ in range(number):
+                func(context)
+            elapsed = time.perf_counter_ns() - started
+        samples.append(elapsed / number / items / 1000)
+    return {'best_us': min(samples), 'median_us': statistics.median(samples),
+            'items': items, 'number': number, 'repeat': repeat}
+
+
+def _fresh_conversation(bot, turns=0):
+    """Give the bot a new conversation state with `turns` logged turns"""
+    bot.state = ConversationState()
+    for message in _messages(turns):
+        analysis = bot.analyze_turn(message)
+        bot.log_conversation(analysis, bot.get_response(message, analysis))
+    return bot
+
+
+def _respond_without_escalating(bot, messages):
+    bot.get_responses(messages)
+    if bot.metrics['escalations_to_human']:
+        raise RuntimeError("end_to_end benchmark escalated; conversation state leaked between timed calls")
+
+
+def run_suite(use_ml=True, batch_sizes=BATCH_SIZES, conversation_lengths=CONVERSATION_LENGTHS,
+              warmup=2, repeat=5):
+    """Time each response stage separately; returns {stage name: timing}.
+
+    Stateless stages (vectorize, classify, rule fallback, sentiment) are swept
+    over batch sizes. Stateful stages run on their own bots, so their metrics
+    and conversation state never mix. end_to_end answers distinct,
+    non-escalating messages in a fresh conversation for every timed call
+    (and fails if any escalates); the per-turn stages start each run from a
+    fresh conversation and are swept over conversation length.
+    """
+    bot = CustomerSupportBot(use_ml=use_ml)
+    engine = bot.inference_engine
+    conversation_bot = CustomerSupportBot(use_ml=use_ml)
+    results = {}
+
+    for batch_size in batch_sizes:
+        messages = _messages(batch_size)
+        conversation = _conversation_messages(conversation_bot, batch_size)
+        number = max(1, 256 // batch_size)
+
+        def timed(stage, func, setup=lambda: None, setup_each=False):
+            results[f"{stage}[batch={batch_size}]"] = _time_stage(func, setup, batch_size, warmup, repeat,
+                                                                   number, setup_each)
+
+        if engine is not None:
+            timed('vectorize', lambda _: engine.transform(messages))
+            features = engine.transform(messages)
+            timed('classify', lambda _: engine.csr_joint_log_likelihood(*features))
+        timed('rule_fallback', lambda _: [bot._rule_based_intent(m) for m in messages])
+        timed('sentiment', lambda _: sentiment_scores(messages))
+        timed('end_to_end', lambda b: _respond_without_escalating(b, conversation),
+              lambda: _fresh_conversation(conversation_bot), setup_each=True)
+
+    messages = _messages(TURNS_PER_RUN)
+    analyses = [bot.analyze_turn(m) for m in messages]
+    rendering_bot = CustomerSupportBot(use_ml=use_ml)
+    results['response_rendering'] = _time_stage(
+        lambda b: [b._generate_intent_response(a.intent, a.user_input, "", a.sentiment) for a in analyses],
+        lambda: _fresh_conversation(rendering_bot), len(analyses), warmup, repeat)
+
+    escalation_bot = CustomerSupportBot(use_ml=use_ml)
+    for length in conversation_lengths:
+        def escalate_and_log(b):
+            for analysis in analyses:
+                b.should_escalate_to_human(analysis)
+                b.log_conversation(analysis, "")
+        results[f"escalation[turns={length}]"] = _time_stage(
+            escalate_and_log, lambda: _fresh_conversation(escalation_bot, length), len(analyses), warmup, repeat)
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Stages whose best time regressed past threshold: [(stage, baseline µs, current µs)]"""
+    regressions = []
+    for stage, timing in results.items():
+        reference = baseline.get(stage)
+        if reference and timing['best_us'] > reference['best_us'] * (1 + threshold):
+            regressions.append((stage, reference['best_us'], timing['best_us']))
+    return regressions
+
+
+def print_suite(results, baseline=None):
+    print(f"{'stage':<28} {'best µs/item':>13} {'median µs/item':>15} {'baseline':>10}")
+    for stage, timing in results.items():
+        reference = (baseline or {}).get(stage)
+        change = f"{timing['best_us'] / reference['best_us'] - 1:+.0%}" if reference else ""
+        print(f"{stage:<28} {timing['best_us']:>13.2f} {timing['median_us']:>15.2f} {change:>10}")
+
+
+def bench_suite(baseline_path=None, update=False, threshold=REGRESSION_THRESHOLD, use_ml=True, repeat=5):
+    """Run the stage suite and check it against (or record) a JSON baseline.
+
+    Returns False when any stage regressed past the threshold.
+    """
+    print("\n" + "="*60)
+    print("🧪 STAGE BENCHMARK SUITE")
+    print("="*60 + "\n")
+
+    results = run_suite(use_ml=use_ml, repeat=repeat)
+    baseline = None
+    if baseline_path and os.path.exists(baseline_path) and not update:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)['results']
+    print_suite(results, baseline)
+
+    if baseline_path and baseline is None:
+        document = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'use_ml': use_ml,
+                'repeat': repeat,
+            },
+            'results': results,
+        }
+        with open(baseline_path, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"\n✓ Baseline written to {baseline_path}")
+        return True
+
+    regressions = compare_to_baseline(results, baseline or {}, threshold)
+    for stage, before, after in regressions:
+        print(f"⚠ {stage} regressed: {before:.2f} -> {after:.2f} µs/item (threshold {threshold:.0%})")
+    if baseline is not None and not regressions:
+        print(f"\n✓ No stage regressed more than {threshold:.0%}")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot performance benchmarks")
+    parser.add_argument('benchmark', choices=['rules', 'orders', 'startup', 'inference', 'instrumentation', 'retrieval',
+                                              'typos', 'suite'],
+                        help="benchmark to run")
+    parser.add_argument('--number', type=int, default=2000, help="calls per timing run")
+    parser.add_argument('--repeat', type=int, default=5, help="timing runs (best is reported)")
+    parser.add_argument('--baseline', help="suite: JSON baseline to compare against (written if missing)")
+    parser.add_argument('--update-baseline', action='store_true', help="suite: overwrite the baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="suite: allowed slowdown per stage before failing (0.3 = 30%%)")
+    parser.add_argument('--rules-only', action='store_true', help="suite: disable the ML intent model")
+    args = parser.parse_args()
+
+    if args.benchmark == 'rules':
+        bench_rule_matcher(args.number, args.repeat)
+    elif args.benchmark == 'orders':
+        bench_order_ids()
+    elif args.benchmark == 'startup':
+        bench_startup()
+    elif args.benchmark == 'inference':
+        bench_inference(args.number // 4, args.repeat)
+    elif args.benchmark == 'instrumentation':
+        bench_instrumentation(args.number, args.repeat)
+    elif args.benchmark == 'retrieval':
+        bench_retrieval(repeat=args.repeat)
+    elif args.benchmark == 'typos':
+        bench_typos(args.number, args.repeat)
+    elif args.benchmark == 'suite':
+        passed = bench_suite(args.baseline, args.update_baseline, args.threshold,
+                             use_ml=not args.rules_only, repeat=args.repeat)
+        sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
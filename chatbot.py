@@ -14,47 +14,508 @@ Features:
 - Hybrid human-AI support system
 """
 
+import os
 import re
 import json
-import pickle
-import numpy as np
+import time
+import threading
+import uuid
 from datetime import datetime
-from collections import defaultdict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.model_selection import train_test_split
+from functools import lru_cache
+from collections import OrderedDict, defaultdict, deque
 import warnings
+
+from latency_histogram import LatencyHistogram
+
 warnings.filterwarnings('ignore')
 
+# numpy, scipy and scikit-learn are imported on first use, so the rule-only
+# mode and short-lived helper processes start without loading them
+MODEL_ARTIFACT_DIR = 'chatbot_model'
+LEGACY_MODEL_FILE = 'chatbot_model.pkl'
 
-class CustomerSupportBot:
-    def __init__(self, use_ml=True):
-        # Conversation tracking
-        self.conversation_history = []
+# Artifact params['training']['source'] of a model trained on TRAINING_DATA
+# (train_corpus records the corpus path instead)
+BUILTIN_TRAINING_SOURCE = 'builtin'
+
+# Examples per partial_fit call when seeding the online model
+ONLINE_SEED_BATCH_SIZE = 10000
+
+
+# Extended sentiment lexicons
+POSITIVE_WORDS = {
+    'good': 1, 'great': 2, 'excellent': 3, 'happy': 2, 'satisfied': 2,
+    'love': 3, 'awesome': 3, 'perfect': 3, 'wonderful': 2, 'fantastic': 3,
+    'appreciate': 2, 'helpful': 2, 'amazing': 3, 'best': 3
+}
+
+NEGATIVE_WORDS = {
+    'bad': 1, 'terrible': 3, 'awful': 3, 'hate': 3, 'angry': 2,
+    'frustrated': 2, 'upset': 2, 'disappointed': 2, 'horrible': 3,
+    'worst': 3, 'useless': 2, 'pathetic': 3, 'disgusting': 3,
+    'never': 1, 'not': 1, 'no': 1, 'problem': 1, 'issue': 1
+}
+
+# Typo tolerance (see build_typo_index): words at least this common in English
+# (Zipf scale; 3.0 is once per million words) are real words, never corrected,
+# and extra spellings that score as a lexicon word only when it is enabled
+TYPO_DICTIONARY_MIN_ZIPF = 3.0
+TYPO_WORD_FORMS = {'frustrating': 'frustrated'}
+
+# Lexicon vocabulary index and per-word (positive, negative) weights, built once
+SENTIMENT_VOCABULARY = {word: index for index, word in enumerate(sorted(set(POSITIVE_WORDS) | set(NEGATIVE_WORDS)))}
+_SENTIMENT_TABLE = {word: (POSITIVE_WORDS.get(word, 0), NEGATIVE_WORDS.get(word, 0))
+                    for word in SENTIMENT_VOCABULARY}
+
+
+# Labelled utterances the intent model is trained on
+TRAINING_DATA = [
+    # Greetings
+    ("hello", "greeting"), ("hi there", "greeting"), ("good morning", "greeting"),
+    ("hey", "greeting"), ("greetings", "greeting"), ("good afternoon", "greeting"),
+
+    # Goodbyes
+    ("bye", "goodbye"), ("goodbye", "goodbye"), ("see you later", "goodbye"),
+    ("exit", "goodbye"), ("quit", "goodbye"), ("close", "goodbye"),
+
+    # Thanks
+    ("thank you", "thanks"), ("thanks a lot", "thanks"), ("appreciate it", "thanks"),
+    ("grateful", "thanks"), ("thanks for help", "thanks"),
+
+    # Refunds
+    ("i want a refund", "refund"), ("refund my money", "refund"),
+    ("how do i get refund", "refund"), ("return money", "refund"),
+    ("i need money back", "refund"), ("reimbursement", "refund"),
+
+    # Order Status
+    ("where is my order", "order_status"), ("track my order", "order_status"),
+    ("order status", "order_status"), ("check delivery", "order_status"),
+    ("when will it arrive", "order_status"), ("order tracking", "order_status"),
+
+    # Cancellation
+    ("cancel my order", "cancel"), ("i want to cancel", "cancel"),
+    ("cancellation request", "cancel"), ("stop my order", "cancel"),
+
+    # Shipping
+    ("how long shipping takes", "shipping"), ("delivery time", "shipping"),
+    ("when will it be delivered", "shipping"), ("shipping information", "shipping"),    
+    ("shipping details", "shipping"),
+    ("delivery options", "shipping"),
+    ("shipping methods", "shipping"),
+    ("estimated delivery", "shipping"),
+    ("shipping cost", "shipping"),
+    ("track shipment", "shipping"),
+    ("where is my package", "shipping"),
+
+    # Payment
+    ("payment methods", "payment"), ("how can i pay", "payment"),
+    ("credit card payment", "payment"), ("payment options", "payment"),
+    ("payment information", "payment"),
+    ("pay with paypal", "payment"),
+    ("secure payment", "payment"),
+    ("payment issues", "payment"),
+    ("billing information", "payment"),
+    ("transaction failed", "payment"),
+    ("refund payment", "payment"),
+
+    # Product Info
+    ("product details", "product_info"), ("tell me about this item", "product_info"),
+    ("product specifications", "product_info"), ("item features", "product_info"),
+
+    # Complaints
+    ("i have a complaint", "complaint"), ("this is not working", "complaint"),
+    ("product is broken", "complaint"), ("damaged item", "complaint"),
+    ("this is terrible", "complaint"), ("very disappointed", "complaint"),
+    ('i am frustrated', "complaint"), ("this is unacceptable", "complaint"),
+    ("i hate this", "complaint"), ("worst experience", "complaint"),
+    ("this is awful", "complaint"),
+    ("i am angry", "complaint"),
+    ("i am upset", "complaint"),
+    ("this is disgusting", "complaint"),
+    ("i will never buy again", "complaint"),
+    ("this product is useless", "complaint"),
+    ("this is pathetic", "complaint"),
+    ("order is damaged", "complaint"),
+    ("item not working", "complaint"),
+    ("damaged product", "complaint"),
+    ("damaged goods", "complaint"),
+    ("defective item", "complaint"),
+    ("damaged upon arrival", "complaint"),
+    ("damaged item received", "complaint"),
+    ("broken upon delivery", "complaint"),
+    ("received a broken item", "complaint"),
+
+
+    # Help
+    ("i need help", "help"), ("can you assist me", "help"),
+    ("what can you do", "help"), ("help me please", "help"),
+    ("i require assistance", "help"),
+    ("i need support", "help"),
+    ("can you support me", "help"),
+    ("i am looking for help", "help"),
+
+    # Human escalation
+    ("speak to human", "human"), ("real person", "human"),
+    ("talk to agent", "human"), ("customer representative", "human"),
+]
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+@lru_cache(maxsize=None)
+def sentiment_weights():
+    """(V, 2) weight matrix over SENTIMENT_VOCABULARY, built on first batch use"""
+    import numpy as np
+    return np.array([_SENTIMENT_TABLE[word] for word in SENTIMENT_VOCABULARY], dtype=np.int64)
+
+
+# Order ID formats in precedence order: ORD12345, #12345, "order 12345", "id 12345".
+# Each lazy alternative scans the whole message before the next one is tried,
+# which matches running the four searches one after another.
+ORDER_ID_PATTERN = re.compile(
+    r'^(?:.*?([Oo][Rr][Dd]\d+)|.*?(#\d+)|.*?(order\s+\d+)|.*?(id\s+\d+))', re.DOTALL
+)
+# Every format contains a digit, so messages without one are rejected cheaply
+_HAS_DIGIT = re.compile(r'\d').search
+
+
+def sentiment_label(positive_score, negative_score):
+    """'positive', 'negative' or 'neutral' for a pair of lexicon scores"""
+    if negative_score > positive_score:
+        return 'negative'
+    if positive_score > negative_score:
+        return 'positive'
+    return 'neutral'
+
+
+def sentiment_scores(messages, typo_index=None):
+    """Positive/negative lexicon scores for many messages as an (N, 2) array.
+
+    Messages become one sparse token-count matrix over the lexicon vocabulary,
+    scored with a single sparse matrix-vector product. With a TypoIndex,
+    words missing from the lexicon are looked up again after correction.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    indptr = [0]
+    indices = []
+    vocabulary = SENTIMENT_VOCABULARY
+    for message in messages:
+        for word in message.lower().split():
+            index = vocabulary.get(word)
+            if index is None and typo_index is not None:
+                index = vocabulary.get(typo_index.correct(word))
+            if index is not None:
+                indices.append(index)
+        indptr.append(len(indices))
+    counts = csr_matrix((np.ones(len(indices), dtype=np.int64), indices, indptr),
+                        shape=(len(indptr) - 1, len(vocabulary)))
+    return counts @ sentiment_weights()
+
+
+class TurnAnalysis:
+    """Intent and sentiment of one user turn, computed once and shared.
+
+    start_time (time.perf_counter_ns) marks when handling of the turn began,
+    before classification, so response_latency covers the whole turn.
+    """
+    __slots__ = ('user_input', 'intent', 'sentiment', 'confidence', 'escalation_reasons', 'start_time')
+
+    def __init__(self, user_input, intent, sentiment, confidence=None, start_time=None):
+        self.user_input = user_input
+        self.intent = intent
+        self.sentiment = sentiment
+        self.confidence = confidence
+        self.escalation_reasons = []
+        self.start_time = time.perf_counter_ns() if start_time is None else start_time
+
+
+class IntentCache:
+    """Bounded LRU cache of (intent, confidence) keyed on normalized input text"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(text):
+        # Case and surrounding whitespace never change the prediction: the
+        # vectorizer lowercases, and no keyword starts or ends with a space
+        return text.lower().strip()
+
+    def get(self, key):
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all cached predictions (the model or rules changed)"""
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Unknown-intent turns within the last UNCLEAR_REQUEST_WINDOW turns (None: the
+# whole conversation) before a turn is escalated; independent of how much
+# conversation history is kept in memory
+UNCLEAR_REQUEST_LIMIT = 2
+UNCLEAR_REQUEST_WINDOW = None
+
+# A question only counts as repeated if asked again within this many turns and seconds
+REPEAT_WINDOW_TURNS = 10
+REPEAT_WINDOW_SECONDS = 600
+
+# Turns kept in memory when turns are streamed to an event log instead
+EVENT_LOG_HISTORY_LIMIT = 20
+
+# history_limit=0: every state shares this deque, which drops whatever is appended
+_NO_HISTORY = deque(maxlen=0)
+
+
+class RepeatDetector:
+    """Fixed-size ring of recent question fingerprints.
+
+    Replaces an ever-growing {question hash: count} table: only the last
+    window_turns questions are kept, and entries older than window_seconds
+    are ignored, so memory per session is constant and only recent repeats
+    are reported.
+    """
+    __slots__ = ('window_seconds', 'recent')
+
+    def __init__(self, window_turns=REPEAT_WINDOW_TURNS, window_seconds=REPEAT_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.recent = deque(maxlen=window_turns)   # (fingerprint, monotonic time)
+
+    @staticmethod
+    def fingerprint(user_input):
+        return hash(user_input.lower()[:50])
+
+    def observe(self, user_input, now=None):
+        """Record a question; return how often it was asked in the window, this time included"""
+        now = time.monotonic() if now is None else now
+        fingerprint = self.fingerprint(user_input)
+        oldest = None if self.window_seconds is None else now - self.window_seconds
+        count = 1
+        for seen, asked_at in self.recent:
+            if seen == fingerprint and (oldest is None or asked_at >= oldest):
+                count += 1
+        self.recent.append((fingerprint, now))
+        return count
+
+    def __len__(self):
+        return len(self.recent)
+
+
+class ConversationState:
+    """Per-conversation state, kept separate from the (shared) model"""
+    __slots__ = ('conversation_history', 'user_name', 'order_id', 'current_context',
+                 'user_frustration_level', 'repeated_questions', 'last_active',
+                 'turn_count', 'unknown_turns', 'unclear_window_turns', 'session_id')
+
+    def __init__(self, history_limit=None, repeat_window_turns=REPEAT_WINDOW_TURNS,
+                 repeat_window_seconds=REPEAT_WINDOW_SECONDS, session_id=None,
+                 unclear_window_turns=UNCLEAR_REQUEST_WINDOW):
+        self.session_id = session_id
+        if history_limit is None:
+            self.conversation_history = []
+        else:
+            self.conversation_history = _NO_HISTORY if history_limit == 0 else deque(maxlen=history_limit)
         self.user_name = None
         self.order_id = None
         self.current_context = None
+        self.user_frustration_level = 0
+        self.repeated_questions = RepeatDetector(repeat_window_turns, repeat_window_seconds)
+        self.last_active = time.monotonic()
+        # Escalation counters, updated as turns are logged
+        self.turn_count = 0
+        self.unknown_turns = ()   # turn numbers of the last UNCLEAR_REQUEST_LIMIT unknown turns
+        self.unclear_window_turns = unclear_window_turns
+
+
+class KeywordMatcher:
+    """Intent keyword table compiled once, in priority order.
+
+    Equivalent to scanning patterns intent by intent and returning the first
+    intent with a keyword contained in the text. Keywords that can never win
+    are dropped at compile time: a keyword containing another keyword of the
+    same or a higher-priority intent (e.g. 'goodbye' contains 'bye', and
+    'shipping' contains the greeting keyword 'hi'). match_tokens is the
+    whole-token variant used with typo tolerance, where nothing is shadowed.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = {intent: tuple(keywords) for intent, keywords in patterns.items() if keywords}
+        self._intents = tuple(self.patterns)
+        # Token matching (match_tokens): first keyword word -> [(priority, remaining words)]
+        self._keyword_starts = {}
+        for priority, keywords in enumerate(self.patterns.values()):
+            for keyword in keywords:
+                first, *rest = keyword.split()
+                self._keyword_starts.setdefault(first, []).append((priority, tuple(rest)))
+        self._candidates = lru_cache(maxsize=4096)(self._keyword_candidates)
+        entries = []
+        for priority, (intent, keywords) in enumerate(patterns.items()):
+            for keyword in keywords:
+                entries.append((priority, keyword, intent))
+        self.entries = tuple(
+            (keyword, intent)
+            for position, (priority, keyword, intent) in enumerate(entries)
+            if not self._is_shadowed(position, entries)
+        )
+
+    @staticmethod
+    def _is_shadowed(position, entries):
+        priority, keyword, _ = entries[position]
+        for other_position, (other_priority, other_keyword, _) in enumerate(entries):
+            if other_position == position or other_keyword not in keyword:
+                continue
+            if other_priority < priority:
+                return True
+            if other_priority == priority and (other_keyword != keyword or other_position < position):
+                return True
+        return False
+
+    def match(self, text):
+        """Return the highest-priority intent with a keyword in (lowercased) text"""
+        for keyword, intent in self.entries:
+            if keyword in text:
+                return intent
+        return None
+
+    def match_tokens(self, tokens):
+        """Return the highest-priority intent with a keyword made of whole tokens.
+
+        Keyword words of four or more letters also match as a token prefix
+        ('thank' matches 'thanks'), but 'hi' never matches inside 'this'.
+        """
+        best = None
+        for position, token in enumerate(tokens):
+            for priority, rest in self._candidates(token):
+                if best is not None and priority >= best:
+                    break
+                following = tokens[position + 1:position + 1 + len(rest)]
+                if len(following) == len(rest) and all(
+                        word == other or (len(word) >= 4 and other.startswith(word))
+                        for word, other in zip(rest, following)):
+                    best = priority
+                    break
+        return None if best is None else self._intents[best]
+
+    def _keyword_candidates(self, token):
+        """(priority, remaining words) of the keywords whose first word matches token, best first"""
+        # The token itself, then its prefixes of four or more letters
+        ends = range(len(token), 3, -1) if len(token) > 4 else (len(token),)
+        return tuple(sorted(entry for end in ends for entry in self._keyword_starts.get(token[:end], ())))
+
+
+def _state_attribute(name):
+    """Expose a ConversationState field as a bot attribute"""
+    return property(lambda self: getattr(self.state, name),
+                    lambda self, value: setattr(self.state, name, value))
+
+
+def _prediction_setting(name):
+    """Expose a setting that changes intent predictions; setting it clears the intent cache"""
+    attribute = f"_{name}"
+
+    def set_value(self, value):
+        setattr(self, attribute, value)
+        self._invalidate_intent_cache()
+
+    return property(lambda self: getattr(self, attribute), set_value)
+
+
+class CustomerSupportBot:
+    conversation_history = _state_attribute('conversation_history')
+    user_name = _state_attribute('user_name')
+    order_id = _state_attribute('order_id')
+    current_context = _state_attribute('current_context')
+    user_frustration_level = _state_attribute('user_frustration_level')
+    repeated_questions = _state_attribute('repeated_questions')
+    use_ml = _prediction_setting('use_ml')
+    confidence_threshold = _prediction_setting('confidence_threshold')
+    retrieval_min_score = _prediction_setting('retrieval_min_score')
+
+    def __init__(self, use_ml=True, intent_cache_size=0, event_log=None, instrumentation=None,
+                 retrieval_fallback=False, typo_tolerance=False):
+        # Conversation tracking; with an event log attached, turns are streamed
+        # to disk and only the most recent ones are kept in memory
+        self.event_log = event_log
+        self.state = ConversationState(
+            EVENT_LOG_HISTORY_LIMIT if event_log is not None else None,
+            session_id=uuid.uuid4().hex
+        )
         
+        # Opt-in LRU cache of intent predictions (0 disables it); changing
+        # use_ml or a threshold clears it
+        self.intent_cache = IntentCache(intent_cache_size) if intent_cache_size else None
+
         # ML components
         self.use_ml = use_ml
-        self.vectorizer = TfidfVectorizer(max_features=500, ngram_range=(1, 2))
-        self.intent_classifier = MultinomialNB()
+        self.inference_engine = None
+        self._model_artifact = None
+        self._vectorizer = None
+        self._intent_classifier = None
         self.model_trained = False
+        self.confidence_threshold = 0.4
+        # Optional per-stage spans and model events (see instrumentation.py)
+        self.instrumentation = instrumentation
+        # Opt-in nearest-neighbour fallback over the training utterances
+        # (see build_retrieval_index); built whenever a model is installed
+        self.retrieval_fallback = retrieval_fallback
+        self.retrieval_index = None
+        self.retrieval_min_score = 0.9
+        # Opt-in correction of misspelled lexicon words and keywords, with
+        # whole-token keyword matching (see build_typo_index and
+        # typo_index.py); the index is rebuilt with the keyword matcher
+        self.typo_tolerance = typo_tolerance
+        self.typo_index = None
+        # Online learning (see enable_online_learning); off until enabled
+        self.online_model = None
+        self.online_batch_size = 16
+        self._pending_corrections = []
+        self._corrections_lock = threading.Lock()
         
         # Performance metrics
         self.metrics = {
             'total_interactions': 0,
             'escalations_to_human': 0,
             'satisfaction_scores': [],
-            'response_times': [],
+            'response_latency': LatencyHistogram(),
             'intents_detected': defaultdict(int),
             'sentiment_distribution': defaultdict(int)
         }
         
         # Context and personalization
-        self.user_frustration_level = 0
-        self.repeated_questions = defaultdict(int)
         self.session_start_time = datetime.now()
         
         # Enhanced patterns (fallback for non-ML mode)
@@ -72,6 +533,7 @@ class CustomerSupportBot:
             'help': ['help', 'support', 'assist', 'what can you'],
             'human': ['speak to human', 'real person', 'agent', 'representative']
         }
+        self.compile_patterns()
         
         # Load or train model
         if self.use_ml:
@@ -79,177 +541,364 @@ class CustomerSupportBot:
     
     def load_or_train_model(self):
         """Load pre-trained model or train a new one"""
-        try:
-            with open('chatbot_model.pkl', 'rb') as f:
-                model_data = pickle.load(f)
-                self.vectorizer = model_data['vectorizer']
-                self.intent_classifier = model_data['classifier']
-                self.model_trained = True
+        from model_artifact import ModelArtifact, ModelArtifactError
+
+        self._invalidate_intent_cache()
+        if os.path.isdir(MODEL_ARTIFACT_DIR):
+            try:
+                self._apply_artifact(ModelArtifact.load(MODEL_ARTIFACT_DIR))
                 print("✓ ML model loaded successfully")
-        except FileNotFoundError:
-            print("⚠ No pre-trained model found. Training new model...")
-            self.train_model()
+                return
+            except ModelArtifactError as e:
+                print(f"⚠ Ignoring invalid model artifact ({e})")
+        if os.path.exists(LEGACY_MODEL_FILE):
+            self.import_legacy_model(LEGACY_MODEL_FILE)
+            return
+        print("⚠ No pre-trained model found. Training new model...")
+        self.train_model()
+
+    def import_legacy_model(self, path=LEGACY_MODEL_FILE):
+        """Import a legacy pickled model and convert it to the artifact format"""
+        import pickle
+        from model_artifact import ModelArtifact
+
+        with open(path, 'rb') as f:
+            model_data = pickle.load(f)
+        vectorizer, classifier = model_data['vectorizer'], model_data['classifier']
+        artifact = ModelArtifact.from_sklearn(vectorizer, classifier)
+        artifact.save(MODEL_ARTIFACT_DIR)
+        self._set_model(artifact, vectorizer, classifier)
+        print(f"✓ Legacy model {path} imported and saved to {MODEL_ARTIFACT_DIR}/")
+
+    def _apply_artifact(self, artifact):
+        self._set_model(artifact)
+
+    def _set_model(self, artifact, vectorizer=None, classifier=None):
+        """Install a model; predictions go through the pure-NumPy inference engine"""
+        from inference_engine import IntentInferenceEngine
+
+        self._model_artifact = artifact
+        self._vectorizer = vectorizer
+        self._intent_classifier = classifier
+        self.inference_engine = IntentInferenceEngine.from_artifact(artifact)
+        self.model_trained = True
+        if self.retrieval_fallback:
+            self.build_retrieval_index()
+        self._invalidate_intent_cache()
+
+    def build_retrieval_index(self, examples=TRAINING_DATA):
+        """Index (text, intent) exemplars for the low-confidence retrieval fallback"""
+        from retrieval_index import RetrievalIndex
+
+        self.retrieval_index = RetrievalIndex(self.inference_engine, [text for text, _ in examples],
+                                              [intent for _, intent in examples])
+        self._invalidate_intent_cache()
+        return self.retrieval_index
+
+    def retrieve(self, messages, k=3):
+        """Nearest training exemplars per message as (label, exemplar, score) Matches"""
+        if self.retrieval_index is None:
+            return [[] for _ in messages]
+        return self.retrieval_index.search(messages, k)
+
+    def _sklearn_model(self):
+        if self._vectorizer is None and self._model_artifact is not None:
+            self._vectorizer, self._intent_classifier = self._model_artifact.to_sklearn()
+        return self._vectorizer, self._intent_classifier
+
+    @property
+    def vectorizer(self):
+        """scikit-learn TfidfVectorizer (rebuilt from the artifact on first access)"""
+        return self._sklearn_model()[0]
+
+    @property
+    def intent_classifier(self):
+        """scikit-learn MultinomialNB (rebuilt from the artifact on first access)"""
+        return self._sklearn_model()[1]
     
     def train_model(self):
         """Train ML model with comprehensive training data"""
-        # Enhanced training dataset
-        training_data = [
-            # Greetings
-            ("hello", "greeting"), ("hi there", "greeting"), ("good morning", "greeting"),
-            ("hey", "greeting"), ("greetings", "greeting"), ("good afternoon", "greeting"),
-            
-            # Goodbyes
-            ("bye", "goodbye"), ("goodbye", "goodbye"), ("see you later", "goodbye"),
-            ("exit", "goodbye"), ("quit", "goodbye"), ("close", "goodbye"),
-            
-            # Thanks
-            ("thank you", "thanks"), ("thanks a lot", "thanks"), ("appreciate it", "thanks"),
-            ("grateful", "thanks"), ("thanks for help", "thanks"),
-            
-            # Refunds
-            ("i want a refund", "refund"), ("refund my money", "refund"),
-            ("how do i get refund", "refund"), ("return money", "refund"),
-            ("i need money back", "refund"), ("reimbursement", "refund"),
-            
-            # Order Status
-            ("where is my order", "order_status"), ("track my order", "order_status"),
-            ("order status", "order_status"), ("check delivery", "order_status"),
-            ("when will it arrive", "order_status"), ("order tracking", "order_status"),
-            
-            # Cancellation
-            ("cancel my order", "cancel"), ("i want to cancel", "cancel"),
-            ("cancellation request", "cancel"), ("stop my order", "cancel"),
-            
-            # Shipping
-            ("how long shipping takes", "shipping"), ("delivery time", "shipping"),
-            ("when will it be delivered", "shipping"), ("shipping information", "shipping"),    
-            ("shipping details", "shipping"),
-            ("delivery options", "shipping"),
-            ("shipping methods", "shipping"),
-            ("estimated delivery", "shipping"),
-            ("shipping cost", "shipping"),
-            ("track shipment", "shipping"),
-            ("where is my package", "shipping"),
-            
-            # Payment
-            ("payment methods", "payment"), ("how can i pay", "payment"),
-            ("credit card payment", "payment"), ("payment options", "payment"),
-            ("payment information", "payment"),
-            ("pay with paypal", "payment"),
-            ("secure payment", "payment"),
-            ("payment issues", "payment"),
-            ("billing information", "payment"),
-            ("transaction failed", "payment"),
-            ("refund payment", "payment"),
-            
-            # Product Info
-            ("product details", "product_info"), ("tell me about this item", "product_info"),
-            ("product specifications", "product_info"), ("item features", "product_info"),
-            
-            # Complaints
-            ("i have a complaint", "complaint"), ("this is not working", "complaint"),
-            ("product is broken", "complaint"), ("damaged item", "complaint"),
-            ("this is terrible", "complaint"), ("very disappointed", "complaint"),
-            ('i am frustrated', "complaint"), ("this is unacceptable", "complaint"),
-            ("i hate this", "complaint"), ("worst experience", "complaint"),
-            ("this is awful", "complaint"),
-            ("i am angry", "complaint"),
-            ("i am upset", "complaint"),
-            ("this is disgusting", "complaint"),
-            ("i will never buy again", "complaint"),
-            ("this product is useless", "complaint"),
-            ("this is pathetic", "complaint"),
-            ("order is damaged", "complaint"),
-            ("item not working", "complaint"),
-            ("damaged product", "complaint"),
-            ("damaged goods", "complaint"),
-            ("defective item", "complaint"),
-            ("damaged upon arrival", "complaint"),
-            ("damaged item received", "complaint"),
-            ("broken upon delivery", "complaint"),
-            ("received a broken item", "complaint"),
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        from model_artifact import ModelArtifact
 
-            
-            # Help
-            ("i need help", "help"), ("can you assist me", "help"),
-            ("what can you do", "help"), ("help me please", "help"),
-            ("i require assistance", "help"),
-            ("i need support", "help"),
-            ("can you support me", "help"),
-            ("i am looking for help", "help"),
-            
-            # Human escalation
-            ("speak to human", "human"), ("real person", "human"),
-            ("talk to agent", "human"), ("customer representative", "human"),
-        ]
-        
-        texts = [text for text, _ in training_data]
-        labels = [label for _, label in training_data]
+        texts = [text for text, _ in TRAINING_DATA]
+        labels = [label for _, label in TRAINING_DATA]
         
         # Train the model
-        X = self.vectorizer.fit_transform(texts)
-        self.intent_classifier.fit(X, labels)
-        self.model_trained = True
+        vectorizer = TfidfVectorizer(max_features=500, ngram_range=(1, 2))
+        classifier = MultinomialNB()
+        X = vectorizer.fit_transform(texts)
+        classifier.fit(X, labels)
+        artifact = ModelArtifact.from_sklearn(vectorizer, classifier)
+        artifact.params['training'] = {'source': BUILTIN_TRAINING_SOURCE}
+        self._set_model(artifact, vectorizer, classifier)
         
         # Save the model
-        model_data = {
-            'vectorizer': self.vectorizer,
-            'classifier': self.intent_classifier
-        }
-        with open('chatbot_model.pkl', 'wb') as f:
-            pickle.dump(model_data, f)
+        artifact.save(MODEL_ARTIFACT_DIR)
         
         print("✓ ML model trained and saved successfully")
+
+    def enable_online_learning(self, batch_size=16, n_features=2 ** 16, examples=None):
+        """Switch intent prediction to an incrementally trained model.
+
+        The model is seeded with what the current model was trained on:
+        TRAINING_DATA for the built-in model, otherwise the (text, intent)
+        examples passed in, e.g. a train_corpus corpus read with
+        itertools.chain.from_iterable(iter_chunks(path)). A corpus-trained or
+        imported model is never silently replaced by one seeded from
+        TRAINING_DATA: without examples this raises RuntimeError.
+        record_correction() then folds labelled turns into it every
+        batch_size corrections, without a refit or restart.
+        """
+        from itertools import islice
+        from online_learning import OnlineIntentModel
+
+        if not (self.use_ml and self.model_trained):
+            raise RuntimeError("online learning needs the ML model (use_ml=True)")
+        if examples is None:
+            source = self._model_artifact.params.get('training', {}).get('source')
+            if source != BUILTIN_TRAINING_SOURCE:
+                raise RuntimeError(f"the current model was trained on {source or 'unknown data'}, "
+                                   "not TRAINING_DATA; pass the examples it was trained on")
+            examples = TRAINING_DATA
+
+        classes = {str(label) for label in self.inference_engine.classes} | set(self.patterns)
+        model = OnlineIntentModel(classes, n_features=n_features)
+        examples = iter(examples)
+        while True:
+            batch = list(islice(examples, ONLINE_SEED_BATCH_SIZE))
+            if not batch:
+                break
+            model.partial_fit([text for text, _ in batch], [label for _, label in batch])
+        self.online_batch_size = batch_size
+        self.online_model = model
+        self._invalidate_intent_cache()
+        print("✓ Online learning enabled")
+
+    def record_correction(self, user_input, intent):
+        """Queue a labelled turn (e.g. an agent-corrected intent) for online learning.
+
+        Returns True when this correction triggered a model update.
+        """
+        if self.online_model is None:
+            raise RuntimeError("online learning is not enabled")
+        if intent not in self.online_model.classes:
+            raise ValueError(f"unknown intent label: {intent}")
+        with self._corrections_lock:
+            self._pending_corrections.append((user_input, intent))
+            if len(self._pending_corrections) < self.online_batch_size:
+                return False
+        return self.apply_corrections() > 0
+
+    def learn_from_history(self, history=None):
+        """Queue every turn in a conversation history that carries a 'corrected_intent'"""
+        history = self.conversation_history if history is None else history
+        for turn in history:
+            if turn.get('corrected_intent'):
+                self.record_correction(turn['user'], turn['corrected_intent'])
+
+    def apply_corrections(self):
+        """Fold all queued corrections into the live model now; returns how many"""
+        with self._corrections_lock:
+            batch, self._pending_corrections = self._pending_corrections, []
+        if not batch:
+            return 0
+        self.online_model.partial_fit([text for text, _ in batch], [label for _, label in batch])
+        self._invalidate_intent_cache()
+        return len(batch)
     
     def detect_intent(self, user_input):
         """ML-based intent detection with fallback to rule-based"""
-        if self.use_ml and self.model_trained:
-            try:
-                X = self.vectorizer.transform([user_input.lower()])
-                intent = self.intent_classifier.predict(X)[0]
-                confidence = max(self.intent_classifier.predict_proba(X)[0])
-                
-                # If confidence is low, fall back to rule-based
-                if confidence < 0.4:
-                    return self._rule_based_intent(user_input)
-                
-                return intent
-            except:
-                return self._rule_based_intent(user_input)
+        return self.classify_intents([user_input])[0][0]
+    
+    def detect_intents(self, messages):
+        """Batch intent detection: one vectorize/predict_proba call for all messages.
+
+        Returns the same intents as calling detect_intent on each message;
+        only rows below the confidence threshold go through the rule fallback.
+        """
+        return [intent for intent, _ in self.classify_intents(messages)]
+
+    def classify_intent(self, user_input):
+        """Return (intent, confidence) for one message"""
+        return self.classify_intents([user_input])[0]
+
+    def classify_intents(self, messages):
+        """Return (intent, confidence) per message.
+
+        confidence is the ML model's top class probability (also reported when
+        the rules took over), or None when the model is not in use. With the
+        intent cache enabled, only messages not seen before are scored.
+        """
+        messages = list(messages)
+        cache = self.intent_cache
+        if cache is None:
+            return self._classify_uncached(messages)
+
+        results = [None] * len(messages)
+        pending = {}
+        for position, message in enumerate(messages):
+            key = cache.normalize(message)
+            cached = cache.get(key)
+            if cached is None:
+                pending.setdefault(key, []).append(position)
+            else:
+                results[position] = cached
+        if pending:
+            keys = list(pending)
+            scored = self._classify_uncached([messages[pending[key][0]] for key in keys])
+            for key, result in zip(keys, scored):
+                cache.put(key, result)
+                for position in pending[key]:
+                    results[position] = result
+        return results
+
+    def _classify_uncached(self, messages):
+        if not messages:
+            return []
+        if not (self.use_ml and (self.model_trained or self.online_model is not None)):
+            return [(self._rule_based_intent(message), None) for message in messages]
+        instrumentation = self._active_instrumentation()
+        try:
+            labels, confidences = self._predict_intents(messages)
+        except Exception as e:
+            if instrumentation is not None:
+                instrumentation.event('fallback', reason='model_error', error=str(e), messages=len(messages))
+            return [(self._rule_based_intent(message), None) for message in messages]
+        threshold = self.confidence_threshold
+        if instrumentation is not None:
+            for label, confidence in zip(labels, confidences):
+                if confidence < threshold:
+                    instrumentation.event('fallback', reason='low_confidence', model_intent=str(label),
+                                          confidence=float(confidence))
+        results = [
+            (label if confidence >= threshold else None, float(confidence))
+            for label, confidence in zip(labels, confidences)
+        ]
+        low = [position for position, (intent, _) in enumerate(results) if intent is None]
+        if not low:
+            return results
+        if self.retrieval_index is None:
+            for position in low:
+                results[position] = (self._rule_based_intent(messages[position]), results[position][1])
+            return results
+        matches = self.retrieval_index.search([messages[position] for position in low], k=1)
+        for position, match in zip(low, matches):
+            results[position] = (self._fallback_intent(messages[position], match[0] if match else None,
+                                                       instrumentation), results[position][1])
+        return results
+
+    def _fallback_intent(self, message, match, instrumentation):
+        """Low-confidence intent: a near-duplicate exemplar, then the keyword rules,
+        then the nearest exemplar for messages no rule recognizes"""
+        intent = None
+        if match is not None and match.score >= self.retrieval_min_score:
+            intent = match.label
         else:
-            return self._rule_based_intent(user_input)
+            rule_intent = self._rule_based_intent(message)
+            if rule_intent != 'unknown' or match is None:
+                return rule_intent
+            intent = match.label
+        if instrumentation is not None:
+            instrumentation.event('fallback', reason='retrieval', intent=intent, exemplar=match.exemplar,
+                                  score=match.score)
+        return intent
+
+    def _active_instrumentation(self):
+        """The attached Instrumentation if it has sinks, else None"""
+        instrumentation = self.instrumentation
+        if instrumentation is None or not instrumentation.sinks:
+            return None
+        return instrumentation
+
+    def _stage(self, stage, func, *args):
+        """Call func(*args), inside an instrumentation span when sinks are attached"""
+        instrumentation = self._active_instrumentation()
+        if instrumentation is None:
+            return func(*args)
+        return instrumentation.call(stage, func, *args)
+
+    def _invalidate_intent_cache(self):
+        if self.intent_cache is not None:
+            self.intent_cache.clear()
+
+    def _predict_intents(self, messages):
+        """Score a batch with the ML model, returning (labels, confidences)"""
+        import numpy as np
+
+        if self.online_model is not None:
+            probabilities, classes = self.online_model.predict_proba(messages)
+        else:
+            probabilities, classes = self.inference_engine.predict_proba(messages), self.inference_engine.classes
+        best = probabilities.argmax(axis=1)
+        labels = classes[best]
+        confidences = probabilities[np.arange(len(messages)), best]
+        return labels, confidences
     
+    def compile_patterns(self):
+        """Rebuild the keyword matcher; call after changing self.patterns"""
+        self._keyword_matcher = KeywordMatcher(self.patterns)
+        if self.typo_tolerance:
+            self.build_typo_index()
+        self._invalidate_intent_cache()
+
+    def build_typo_index(self, max_distance=1, min_length=5):
+        """Index the sentiment lexicon and single-word keywords for typo correction.
+
+        Only tokens missing from the English word list (wordfreq, words with a
+        Zipf frequency of at least TYPO_DICTIONARY_MIN_ZIPF) and the training
+        vocabulary are corrected. Keyword fragments and multi-word keyword
+        parts ('reimburs', 'is', 'my') are not indexed. wordfreq is an optional
+        dependency, imported only here.
+        """
+        from typo_index import TypoIndex
+        from wordfreq import get_frequency_list
+
+        # Frequency buckets are one centibel apart: bucket i holds words of frequency 10 ** (-i / 100).
+        # The words needed are copied out; wordfreq's own cache is left as it is
+        buckets = get_frequency_list('en')
+        known_words = {word for bucket in buckets[:int((9 - TYPO_DICTIONARY_MIN_ZIPF) * 100) + 1]
+                       for word in bucket}
+        known_words |= {word for text, _ in TRAINING_DATA for word in text.lower().split()}
+        keyword_words = {keyword for keywords in self.patterns.values() for keyword in keywords
+                         if ' ' not in keyword and len(keyword) >= min_length and keyword in known_words}
+        self.typo_index = TypoIndex(SENTIMENT_VOCABULARY.keys() | keyword_words, max_distance, min_length,
+                                    known_words=known_words, aliases=TYPO_WORD_FORMS)
+        self._invalidate_intent_cache()
+        return self.typo_index
+
     def _rule_based_intent(self, user_input):
         """Fallback rule-based intent detection"""
-        user_input = user_input.lower()
-        for intent, keywords in self.patterns.items():
-            for keyword in keywords:
-                if keyword in user_input:
-                    return intent
-        return 'unknown'
+        if self.typo_index is not None:
+            # Keywords must match whole (corrected) tokens, so neither a correction
+            # nor a keyword inside another word ('hi' in 'this') picks the intent
+            intent = self._keyword_matcher.match_tokens(self.typo_index.correct_tokens(user_input))
+        else:
+            intent = self._keyword_matcher.match(user_input.lower())
+        return intent or 'unknown'
 
     def detect_sentiment(self, user_input):
         """Enhanced sentiment analysis with weighted scoring"""
-        # Extended sentiment lexicons
-        positive_words = {
-            'good': 1, 'great': 2, 'excellent': 3, 'happy': 2, 'satisfied': 2,
-            'love': 3, 'awesome': 3, 'perfect': 3, 'wonderful': 2, 'fantastic': 3,
-            'appreciate': 2, 'helpful': 2, 'amazing': 3, 'best': 3
-        }
-        
-        negative_words = {
-            'bad': 1, 'terrible': 3, 'awful': 3, 'hate': 3, 'angry': 2,
-            'frustrated': 2, 'upset': 2, 'disappointed': 2, 'horrible': 3,
-            'worst': 3, 'useless': 2, 'pathetic': 3, 'disgusting': 3,
-            'never': 1, 'not': 1, 'no': 1, 'problem': 1, 'issue': 1
-        }
-        
-        user_input = user_input.lower()
-        words = user_input.split()
-        
-        positive_score = sum(positive_words.get(word, 0) for word in words)
-        negative_score = sum(negative_words.get(word, 0) for word in words)
-        
+        positive_score = negative_score = 0
+        table = _SENTIMENT_TABLE
+        typo_index = self.typo_index
+        for word in user_input.lower().split():
+            weights = table.get(word)
+            if weights is None and typo_index is not None:
+                weights = table.get(typo_index.correct(word))
+            if weights is not None:
+                positive_score += weights[0]
+                negative_score += weights[1]
+        return self._apply_sentiment(positive_score, negative_score)
+
+    def detect_sentiments(self, messages):
+        """Batch sentiment detection; frustration is updated message by message"""
+        return [self._apply_sentiment(positive_score, negative_score)
+                for positive_score, negative_score in sentiment_scores(messages, self.typo_index).tolist()]
+
+    def _apply_sentiment(self, positive_score, negative_score):
+        """Turn lexicon scores into a sentiment and update the session's frustration"""
         # Track frustration level
         if negative_score > positive_score + 2:
             self.user_frustration_level += 1
@@ -257,12 +906,7 @@ class CustomerSupportBot:
             self.user_frustration_level = max(0, self.user_frustration_level - 1)
         
         # Determine sentiment
-        if negative_score > positive_score:
-            sentiment = 'negative'
-        elif positive_score > negative_score:
-            sentiment = 'positive'
-        else:
-            sentiment = 'neutral'
+        sentiment = sentiment_label(positive_score, negative_score)
         
         # Update metrics
         self.metrics['sentiment_distribution'][sentiment] += 1
@@ -271,21 +915,24 @@ class CustomerSupportBot:
 
     def extract_order_id(self, user_input):
         """Extract order ID from user input"""
-        patterns = [
-            r'[Oo][Rr][Dd]\d+',
-            r'#\d+',
-            r'order\s+(\d+)',
-            r'id\s+(\d+)'
-        ]
+        if _HAS_DIGIT(user_input) is None:
+            return None
+        match = ORDER_ID_PATTERN.match(user_input)
+        return match.group(match.lastindex) if match else None
 
-        for pattern in patterns:
-            match = re.search(pattern, user_input)
-            if match:
-                return match.group(0)
-        return None
+    def extract_order_ids(self, messages):
+        """Extract the first order ID (or None) from each of many messages"""
+        has_digit = _HAS_DIGIT
+        match_order_id = ORDER_ID_PATTERN.match
+        order_ids = []
+        for message in messages:
+            match = match_order_id(message) if has_digit(message) is not None else None
+            order_ids.append(match.group(match.lastindex) if match else None)
+        return order_ids
     
-    def should_escalate_to_human(self, user_input, intent):
+    def should_escalate_to_human(self, analysis):
         """Intelligent escalation logic based on multiple factors"""
+        user_input, intent = analysis.user_input, analysis.intent
         escalation_reasons = []
         
         # Check frustration level
@@ -296,10 +943,8 @@ class CustomerSupportBot:
         if intent == 'human':
             escalation_reasons.append("Direct human request")
         
-        # Check for repeated questions
-        question_hash = hash(user_input.lower()[:50])
-        self.repeated_questions[question_hash] += 1
-        if self.repeated_questions[question_hash] >= 2:
+        # Check for repeated questions (recent ones only)
+        if self.repeated_questions.observe(user_input) >= 2:
             escalation_reasons.append("Repeated question")
         
         # Check for complex complaint
@@ -307,25 +952,93 @@ class CustomerSupportBot:
             escalation_reasons.append("Complex complaint")
         
         # Check for unknown intent multiple times
-        if intent == 'unknown' and len([h for h in self.conversation_history if 'unknown' in str(h)]) >= 2:
+        if intent == 'unknown' and self._recent_unknown_turns() >= UNCLEAR_REQUEST_LIMIT:
             escalation_reasons.append("Multiple unclear requests")
         
         return len(escalation_reasons) > 0, escalation_reasons
 
-    def get_response(self, user_input):
+    def _recent_unknown_turns(self):
+        """Logged unknown-intent turns inside the unclear-request window (constant time)"""
+        state = self.state
+        window = state.unclear_window_turns
+        if window is None:
+            return len(state.unknown_turns)
+        oldest = state.turn_count - window
+        return sum(1 for turn in state.unknown_turns if turn > oldest)
+
+    def analyze_turn(self, user_input, intent=None, sentiment_score=None, confidence=None, start_time=None):
+        """Detect intent and sentiment for a turn exactly once.
+
+        Batch callers pass the precomputed intent (and its confidence) and the
+        (positive, negative) lexicon score; the frustration update still
+        happens here, in turn order. start_time (time.perf_counter_ns, now by
+        default) is when handling of the turn began; batch callers move it
+        back by the turn's share of the batch classification.
+        """
+        if start_time is None:
+            start_time = time.perf_counter_ns()
+        if intent is None:
+            intent, confidence = self._stage('detect_intent', self.classify_intent, user_input)
+        if sentiment_score is None:
+            sentiment = self._stage('detect_sentiment', self.detect_sentiment, user_input)
+        else:
+            sentiment = self._apply_sentiment(*sentiment_score)
+        instrumentation = self._active_instrumentation()
+        if instrumentation is not None:
+            instrumentation.event('intent', intent=str(intent), confidence=confidence)
+        return TurnAnalysis(user_input, intent, sentiment, confidence, start_time)
+
+    def get_response(self, user_input, analysis=None):
         """Generate context-aware, personalized responses"""
-        start_time = datetime.now()
-        
-        # Detect intent and sentiment
-        intent = self.detect_intent(user_input)
-        sentiment = self.detect_sentiment(user_input)
+        instrumentation = self._active_instrumentation()
+        if instrumentation is not None:
+            return instrumentation.call('get_response', self._get_response, user_input, analysis)
+        return self._get_response(user_input, analysis)
+
+    def _get_response(self, user_input, analysis):
+        if analysis is None:
+            analysis = self.analyze_turn(user_input)
+        return self._respond(analysis)
+
+    def _classify_batch(self, messages):
+        """Classify a batch once, returning (classified, sentiment scores, per-turn cost in ns).
+
+        The per-turn cost is the batch classification time spread evenly over
+        its messages, and is charged to each turn's response latency.
+        """
+        start_time = time.perf_counter_ns()
+        classified = self._stage('detect_intents', self.classify_intents, messages)
+        scores = self._stage('sentiment_scores', sentiment_scores, messages, self.typo_index).tolist()
+        return classified, scores, (time.perf_counter_ns() - start_time) // max(len(messages), 1)
+
+    def get_responses(self, messages):
+        """Generate responses for a batch of messages from the same conversation.
+
+        Intents are classified in one batch; sentiment, escalation and context
+        are then applied message by message, so the responses are identical to
+        calling get_response on each message in order.
+        """
+        messages = list(messages)
+        classified, scores, share = self._classify_batch(messages)
+        responses = []
+        for message, (intent, confidence), score in zip(messages, classified, scores):
+            analysis = self.analyze_turn(message, intent, score, confidence, time.perf_counter_ns() - share)
+            responses.append(self._respond(analysis))
+        return responses
+
+    def _respond(self, analysis):
+        """Build the response for an analyzed turn, recording its latency since analysis.start_time"""
+        user_input = analysis.user_input
+        intent = analysis.intent
+        sentiment = analysis.sentiment
         
         # Update metrics
         self.metrics['total_interactions'] += 1
         self.metrics['intents_detected'][intent] += 1
         
         # Check for human escalation
-        should_escalate, reasons = self.should_escalate_to_human(user_input, intent)
+        should_escalate, reasons = self._stage('should_escalate_to_human', self.should_escalate_to_human, analysis)
+        analysis.escalation_reasons = reasons
         if should_escalate:
             self.metrics['escalations_to_human'] += 1
             return self._escalate_to_human(reasons)
@@ -334,11 +1047,11 @@ class CustomerSupportBot:
         response_prefix = self._get_response_prefix(sentiment, intent)
         
         # Generate response based on intent
-        response = self._generate_intent_response(intent, user_input, response_prefix, sentiment)
+        response = self._stage('generate_response', self._generate_intent_response,
+                               intent, user_input, response_prefix, sentiment)
         
         # Track response time
-        response_time = (datetime.now() - start_time).total_seconds()
-        self.metrics['response_times'].append(response_time)
+        self.metrics['response_latency'].record(time.perf_counter_ns() - analysis.start_time)
         
         return response
     
@@ -437,17 +1150,58 @@ class CustomerSupportBot:
         )
 
 
-    def log_conversation(self, user_input, bot_response, intent, sentiment):
+    def log_conversation(self, analysis, bot_response):
         """Enhanced conversation logging with metadata"""
+        state = self.state
+        state.turn_count += 1
+        if analysis.intent == 'unknown':
+            state.unknown_turns = (state.unknown_turns + (state.turn_count,))[-UNCLEAR_REQUEST_LIMIT:]
+        if state.conversation_history is _NO_HISTORY and self.event_log is None:
+            return
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.conversation_history.append({
+        entry = {
             'timestamp': timestamp,
-            'user': user_input,
+            'user': analysis.user_input,
             'bot': bot_response,
-            'intent': intent,
-            'sentiment': sentiment,
+            'intent': analysis.intent,
+            'sentiment': analysis.sentiment,
             'frustration_level': self.user_frustration_level
-        })
+        }
+        self.conversation_history.append(entry)
+        
+        if self.event_log is not None:
+            self.event_log.write(dict(
+                entry,
+                type='turn',
+                session_id=self.state.session_id,
+                turn=self.state.turn_count,
+                confidence=analysis.confidence,
+                escalation_reasons=analysis.escalation_reasons or [],
+            ))
+
+    def log_session_summary(self, state=None):
+        """Write a session summary record to the event log.
+
+        Without a state this summarizes the bot's own session, including the
+        metrics; SessionManager passes the state of the session that ended
+        (its metrics are shared across sessions, so they are not repeated).
+        """
+        if self.event_log is None:
+            return
+        own_session = state is None
+        state = self.state if own_session else state
+        record = {
+            'type': 'session',
+            'session_id': state.session_id,
+            'end_time': datetime.now().isoformat(),
+            'turns': state.turn_count,
+            'frustration_level': state.user_frustration_level,
+            'order_id': state.order_id,
+        }
+        if own_session:
+            record['session_info'] = self._session_info()
+            record['metrics'] = self._metrics_summary()
+        self.event_log.write(record)
     
     def collect_satisfaction_feedback(self):
         """Collect customer satisfaction score"""
@@ -486,9 +1240,11 @@ class CustomerSupportBot:
         report += f"  • Escalation Rate: {(self.metrics['escalations_to_human']/max(1, self.metrics['total_interactions'])*100):.1f}%\n"
         
         # Response time
-        if self.metrics['response_times']:
-            avg_response = np.mean(self.metrics['response_times']) * 1000
-            report += f"  • Avg Response Time: {avg_response:.2f}ms\n"
+        latency = self.metrics['response_latency'].summary_ms()
+        if latency['count']:
+            report += f"  • Avg Response Time: {latency['mean_ms']:.2f}ms\n"
+            report += (f"  • Response Time p50/p90/p99: {latency['p50_ms']:.2f}/{latency['p90_ms']:.2f}/"
+                       f"{latency['p99_ms']:.2f}ms (max {latency['max_ms']:.2f}ms)\n")
         
         # Intent distribution
         report += f"\n🎯 Intent Distribution:\n"
@@ -504,7 +1260,7 @@ class CustomerSupportBot:
         
         # Customer satisfaction
         if self.metrics['satisfaction_scores']:
-            avg_satisfaction = np.mean(self.metrics['satisfaction_scores'])
+            avg_satisfaction = _mean(self.metrics['satisfaction_scores'])
             report += f"\n⭐ Customer Satisfaction:\n"
             report += f"  • Average Score: {avg_satisfaction:.2f}/5.00\n"
             report += f"  • Total Ratings: {len(self.metrics['satisfaction_scores'])}\n"
@@ -518,6 +1274,11 @@ class CustomerSupportBot:
         # Model performance
         report += f"\n🤖 AI Model Performance:\n"
         report += f"  • ML Model Active: {'Yes' if self.use_ml and self.model_trained else 'No'}\n"
+        if self.intent_cache is not None:
+            cache_stats = self.intent_cache.stats()
+            report += (f"  • Intent Cache: {cache_stats['hit_rate']*100:.1f}% hit rate "
+                       f"({cache_stats['size']}/{cache_stats['maxsize']} entries, "
+                       f"{cache_stats['evictions']} evictions)\n")
         report += f"  • Context Tracking: Enabled\n"
         report += f"  • Sentiment Analysis: Enhanced\n"
         
@@ -525,26 +1286,48 @@ class CustomerSupportBot:
         
         return report
     
+    def _session_info(self):
+        return {
+            'start_time': self.session_start_time.isoformat(),
+            'end_time': datetime.now().isoformat(),
+            'duration_minutes': (datetime.now() - self.session_start_time).total_seconds() / 60
+        }
+
+    def _metrics_summary(self):
+        latency = self.metrics['response_latency'].summary_ms()
+        return {
+            'total_interactions': self.metrics['total_interactions'],
+            'escalations_to_human': self.metrics['escalations_to_human'],
+            'escalation_rate': self.metrics['escalations_to_human']/max(1, self.metrics['total_interactions']),
+            'average_response_time_ms': latency['mean_ms'],
+            'response_time_percentiles_ms': {
+                'p50': latency['p50_ms'],
+                'p90': latency['p90_ms'],
+                'p99': latency['p99_ms'],
+                'max': latency['max_ms'],
+            },
+            'response_latency_histogram': self.metrics['response_latency'].to_dict(),
+            'intents_detected': dict(self.metrics['intents_detected']),
+            'sentiment_distribution': dict(self.metrics['sentiment_distribution']),
+            'satisfaction_scores': self.metrics['satisfaction_scores'],
+            'average_satisfaction': _mean(self.metrics['satisfaction_scores']) if self.metrics['satisfaction_scores'] else 0
+        }
+
     def save_metrics_to_file(self):
-        """Save metrics to JSON file for research analysis"""
+        """Save metrics to JSON file for research analysis.
+
+        With an event log attached only the last EVENT_LOG_HISTORY_LIMIT turns
+        are in memory, so the file holds those and names the event log files
+        that have the full transcript.
+        """
         metrics_data = {
-            'session_info': {
-                'start_time': self.session_start_time.isoformat(),
-                'end_time': datetime.now().isoformat(),
-                'duration_minutes': (datetime.now() - self.session_start_time).total_seconds() / 60
-            },
-            'metrics': {
-                'total_interactions': self.metrics['total_interactions'],
-                'escalations_to_human': self.metrics['escalations_to_human'],
-                'escalation_rate': self.metrics['escalations_to_human']/max(1, self.metrics['total_interactions']),
-                'average_response_time_ms': np.mean(self.metrics['response_times']) * 1000 if self.metrics['response_times'] else 0,
-                'intents_detected': dict(self.metrics['intents_detected']),
-                'sentiment_distribution': dict(self.metrics['sentiment_distribution']),
-                'satisfaction_scores': self.metrics['satisfaction_scores'],
-                'average_satisfaction': np.mean(self.metrics['satisfaction_scores']) if self.metrics['satisfaction_scores'] else 0
-            },
-            'conversation_history': self.conversation_history
+            'session_info': self._session_info(),
+            'metrics': self._metrics_summary(),
+            'conversation_history': list(self.conversation_history)
         }
+        if self.event_log is not None:
+            metrics_data['conversation_history_omitted_turns'] = self.state.turn_count - len(self.conversation_history)
+            metrics_data['event_log_files'] = list(self.event_log.files_written)
         
         filename = f"chatbot_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         with open(filename, 'w') as f:
@@ -571,11 +1354,10 @@ class CustomerSupportBot:
                 if not user_input:
                     continue
 
-                intent = self.detect_intent(user_input)
-                sentiment = self.detect_sentiment(user_input)
+                analysis = self.analyze_turn(user_input)
 
-                if intent == 'goodbye':
-                    response = self.get_response(user_input)
+                if analysis.intent == 'goodbye':
+                    response = self.get_response(user_input, analysis)
                     print(f"Bot: {response}\n")
                     
                     # Collect feedback
@@ -585,15 +1367,17 @@ class CustomerSupportBot:
                     print(self.generate_metrics_report())
                     
                     # Save to file
+                    self.log_session_summary()
                     self.save_metrics_to_file()
                     break
 
-                response = self.get_response(user_input)
+                response = self.get_response(user_input, analysis)
                 print(f"Bot: {response}\n")
-                self.log_conversation(user_input, response, intent, sentiment)
+                self.log_conversation(analysis, response)
                 
             except KeyboardInterrupt:
                 print("\n\nBot: Session interrupted. Saving metrics...")
+                self.log_session_summary()
                 self.save_metrics_to_file()
                 break
             except Exception as e:
@@ -602,6 +1386,109 @@ class CustomerSupportBot:
                 self.metrics['escalations_to_human'] += 1
 
 
+class SessionManager:
+    """Serve many concurrent conversations from one shared model.
+
+    The TF-IDF vectorizer, classifier and patterns are loaded once on a single
+    CustomerSupportBot; every session only holds a compact ConversationState.
+    Turn history is not kept unless history_limit is set (the manager never
+    reads it; attach an event log to keep transcripts). Sessions are evicted
+    least-recently-used beyond max_sessions, and after ttl_seconds without
+    activity. Metrics accumulate on the shared bot.
+    """
+
+    def __init__(self, bot=None, max_sessions=100000, ttl_seconds=1800, history_limit=0,
+                 repeat_window_turns=REPEAT_WINDOW_TURNS, repeat_window_seconds=REPEAT_WINDOW_SECONDS,
+                 unclear_window_turns=UNCLEAR_REQUEST_WINDOW):
+        self.bot = bot if bot is not None else CustomerSupportBot()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.history_limit = history_limit
+        self.repeat_window_turns = repeat_window_turns
+        self.repeat_window_seconds = repeat_window_seconds
+        self.unclear_window_turns = unclear_window_turns
+        self.sessions = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get_state(self, session_id):
+        """Return the state for a session, creating it if needed"""
+        with self._lock:
+            now = time.monotonic()
+            self.evict_expired(now)
+            state = self.sessions.get(session_id)
+            if state is None:
+                state = ConversationState(self.history_limit, self.repeat_window_turns,
+                                          self.repeat_window_seconds, session_id, self.unclear_window_turns)
+                self.sessions[session_id] = state
+                while len(self.sessions) > self.max_sessions:
+                    _, evicted = self.sessions.popitem(last=False)
+                    self.evictions += 1
+                    self.bot.log_session_summary(evicted)
+            else:
+                self.sessions.move_to_end(session_id)
+            state.last_active = now
+            return state
+
+    def evict_expired(self, now=None):
+        """Drop sessions idle for longer than ttl_seconds"""
+        if self.ttl_seconds is None:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # Sessions are kept in access order, so expired ones are at the front
+            while self.sessions:
+                session_id, state = next(iter(self.sessions.items()))
+                if now - state.last_active < self.ttl_seconds:
+                    break
+                del self.sessions[session_id]
+                self.evictions += 1
+                self.bot.log_session_summary(state)
+
+    def end_session(self, session_id):
+        """Forget a finished conversation; returns whether it was open"""
+        with self._lock:
+            state = self.sessions.pop(session_id, None)
+            if state is not None:
+                self.bot.log_session_summary(state)
+            return state is not None
+
+    def end_all(self):
+        """End every open conversation (e.g. at shutdown); returns how many ended"""
+        with self._lock:
+            ended = len(self.sessions)
+            while self.sessions:
+                _, state = self.sessions.popitem(last=False)
+                self.bot.log_session_summary(state)
+            return ended
+
+    def respond(self, session_id, user_input):
+        """Answer one message, returning (response, analysis)"""
+        return self.respond_many([(session_id, user_input)])[0]
+
+    def respond_many(self, turns):
+        """Answer (session_id, message) pairs in order with one batched classification"""
+        turns = list(turns)
+        with self._lock:
+            bot = self.bot
+            classified, scores, share = bot._classify_batch([user_input for _, user_input in turns])
+            results = []
+            previous_state = bot.state
+            try:
+                for (session_id, user_input), (intent, confidence), score in zip(turns, classified, scores):
+                    bot.state = self.get_state(session_id)
+                    analysis = bot.analyze_turn(user_input, intent, score, confidence, time.perf_counter_ns() - share)
+                    response = bot.get_response(user_input, analysis)
+                    bot.log_conversation(analysis, response)
+                    results.append((response, analysis))
+            finally:
+                bot.state = previous_state
+            return results
+
+
 def main():
     bot = CustomerSupportBot()
     bot.run()
@@ -0,0 +1,268 @@
+"""
+Asyncio Server Mode for the Customer Support Chatbot
+Serves many concurrent conversations over newline-delimited JSON (TCP or unix socket)
+
+Protocol (one JSON object per line):
+    -> {"session_id": "abc", "text": "Where is my order?", "id": 1}
+    <- {"session_id": "abc", "id": 1, "response": "...", "intent": "order_status",
+        "sentiment": "neutral", "escalated": false, "latency_ms": 1.84}
+    -> {"op": "stats"}
+    <- {"queue_depth": 0, "sessions": 1, "requests": 1, ...}
+    -> {"op": "end", "session_id": "abc"}
+    <- {"session_id": "abc", "ended": true}
+
+Ending a session (after its pending messages on that connection are
+answered) writes its summary record to the event log; sessions still open
+when the server shuts down are summarized then.
+
+Pending messages are grouped into micro-batches of up to --batch-size messages
+or --batch-delay-ms milliseconds and classified in a worker thread, so the
+event loop never blocks on scikit-learn. At most --max-queue messages wait
+for a batch; when the queue is full a connection is not read any further
+until there is room, so a fast client is slowed down by TCP backpressure
+instead of growing the server's memory.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chatbot import CustomerSupportBot, SessionManager
+from event_log import EventLog
+from latency_histogram import LatencyHistogram
+
+
+class ChatServer:
+    def __init__(self, manager=None, max_batch_size=32, max_delay_ms=5.0, max_queue_size=1024):
+        self.manager = manager if manager is not None else SessionManager()
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        # A single worker thread keeps batches (and so each session) in order
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = None
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'batches': 0,
+        }
+        self.latency = LatencyHistogram()
+
+    def get_stats(self):
+        """Queue depth, batch sizes and request latency"""
+        requests = self.stats['requests']
+        latency = self.latency.summary_ms()
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'sessions': len(self.manager),
+            'requests': requests,
+            'errors': self.stats['errors'],
+            'batches': self.stats['batches'],
+            'avg_batch_size': requests / max(1, self.stats['batches']),
+            'avg_latency_ms': latency['mean_ms'],
+            'p50_latency_ms': latency['p50_ms'],
+            'p90_latency_ms': latency['p90_ms'],
+            'p99_latency_ms': latency['p99_ms'],
+            'max_latency_ms': latency['max_ms'],
+        }
+
+    async def submit(self, session_id, text):
+        """Queue one message and wait for its (response, analysis)"""
+        return await (await self._enqueue(session_id, text))
+
+    async def _enqueue(self, session_id, text):
+        """Queue one message, waiting while the queue is full; returns its future"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((session_id, text, future))
+        return future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            turns = [(session_id, text) for session_id, text, _ in batch]
+            self.stats['batches'] += 1
+            try:
+                results = await loop.run_in_executor(self.executor, self.manager.respond_many, turns)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _reply(self, writer, request, start, future):
+        reply = {'session_id': request.get('session_id')}
+        if 'id' in request:
+            reply['id'] = request['id']
+        try:
+            response, analysis = await future
+        except Exception as e:
+            self.stats['errors'] += 1
+            reply['error'] = str(e)
+        else:
+            latency_ns = time.perf_counter_ns() - start
+            self.stats['requests'] += 1
+            self.latency.record(latency_ns)
+            reply.update({
+                'response': response,
+                'intent': str(analysis.intent),
+                'sentiment': analysis.sentiment,
+                'escalated': bool(analysis.escalation_reasons),
+                'latency_ms': round(latency_ns / 1e6, 3),
+            })
+        await self._write(writer, reply)
+
+    async def _end(self, writer, request):
+        reply = {'session_id': request.get('session_id')}
+        if 'id' in request:
+            reply['id'] = request['id']
+        if 'session_id' in request:
+            loop = asyncio.get_running_loop()
+            reply['ended'] = await loop.run_in_executor(
+                self.executor, self.manager.end_session, str(request['session_id']))
+        else:
+            self.stats['errors'] += 1
+            reply['error'] = "end needs 'session_id'"
+        await self._write(writer, reply)
+
+    async def _write(self, writer, message):
+        writer.write((json.dumps(message) + "\n").encode('utf-8'))
+        await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        """Read requests from one connection; replies are written as they complete"""
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    self.stats['errors'] += 1
+                    await self._write(writer, {'error': f"invalid request: {e}"})
+                    continue
+
+                if request.get('op') == 'stats':
+                    await self._write(writer, self.get_stats())
+                    continue
+                if request.get('op') == 'end':
+                    if pending:
+                        await asyncio.gather(*pending)
+                    await self._end(writer, request)
+                    continue
+                if 'session_id' not in request or 'text' not in request:
+                    self.stats['errors'] += 1
+                    await self._write(writer, {'error': "request needs 'session_id' and 'text'"})
+                    continue
+
+                start = time.perf_counter_ns()
+                # Waits while the queue is full, so this connection stops being read
+                future = await self._enqueue(str(request['session_id']), str(request['text']))
+                task = asyncio.ensure_future(self._reply(writer, request, start, future))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """Start listening and return the asyncio server"""
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._batcher = asyncio.ensure_future(self._batch_loop())
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle_client, path=unix_path)
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    def _shutdown(self):
+        self._batcher.cancel()
+        self.executor.shutdown(wait=False)
+        # Summarize the sessions still open (the manager lock waits out a running batch)
+        self.manager.end_all()
+
+    async def close(self, server):
+        server.close()
+        await server.wait_closed()
+        self._shutdown()
+
+    async def serve_forever(self, host='127.0.0.1', port=8765, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        where = unix_path or f"{host}:{port}"
+        print(f"✓ Chatbot server listening on {where} "
+              f"(batch size {self.max_batch_size}, batch delay {self.max_delay * 1000:.1f}ms, "
+              f"queue {self.max_queue_size})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the chatbot over newline-delimited JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', dest='unix_path', help="listen on a unix socket instead of TCP")
+    parser.add_argument('--batch-size', type=int, default=32, help="max messages per micro-batch")
+    parser.add_argument('--batch-delay-ms', type=float, default=5.0, help="max wait to fill a micro-batch")
+    parser.add_argument('--max-queue', type=int, default=1024,
+                        help="max messages waiting for a batch before clients are no longer read")
+    parser.add_argument('--max-sessions', type=int, default=100000)
+    parser.add_argument('--session-ttl', type=float, default=1800, help="idle seconds before a session expires")
+    parser.add_argument('--rules-only', action='store_true', help="disable the ML intent model")
+    parser.add_argument('--intent-cache-size', type=int, default=0, help="LRU intent cache entries (0 disables)")
+    parser.add_argument('--retrieval-fallback', action='store_true',
+                        help="answer low-confidence messages from the nearest training utterance")
+    parser.add_argument('--typo-tolerance', action='store_true',
+                        help="correct misspelled sentiment words and keywords (edit distance 1)")
+    parser.add_argument('--event-log', metavar='DIR', help="stream turn and session records to JSONL files in DIR")
+    args = parser.parse_args()
+
+    event_log = EventLog(args.event_log) if args.event_log else None
+    bot = CustomerSupportBot(use_ml=not args.rules_only, intent_cache_size=args.intent_cache_size,
+                             event_log=event_log, retrieval_fallback=args.retrieval_fallback,
+                             typo_tolerance=args.typo_tolerance)
+    manager = SessionManager(bot, max_sessions=args.max_sessions, ttl_seconds=args.session_ttl)
+    server = ChatServer(manager, max_batch_size=args.batch_size, max_delay_ms=args.batch_delay_ms,
+                        max_queue_size=args.max_queue)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix_path))
+    except KeyboardInterrupt:
+        print("\n✓ Server stopped")
+    finally:
+        if event_log is not None:
+            event_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Evaluation Harness for the Intent and Sentiment Models
+Cross-validated hyperparameter sweeps, run in parallel with cached features
+
+Usage:
+    python evaluate_models.py                          # built-in TRAINING_DATA
+    python evaluate_models.py --corpus transcripts.jsonl --folds 5 --workers 8
+    python evaluate_models.py --max-features 500 2000 --ngram-max 1 2 --alpha 0.1 1.0 \\
+                              --threshold 0.3 0.4 --json evaluation.json
+
+Each (max_features, ngram_range) setting is one job in a process pool. A job
+vectorizes the stratified k folds once and caches them under --cache-dir
+(keyed by the data and the vectorizer settings), then sweeps NB alpha and the
+confidence threshold on the cached matrices. Below the threshold the bot's
+keyword rules answer, exactly as in CustomerSupportBot. Per-message
+inference latency is measured with the IntentInferenceEngine the bot serves
+with. The lexicon sentiment model is scored on held-out labelled examples.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from chatbot import TRAINING_DATA, CustomerSupportBot, sentiment_label, sentiment_scores
+
+
+CACHE_DIR = '.eval_cache'
+
+# Held-out labelled sentences for the lexicon sentiment model (used when the
+# corpus has no 'sentiment' field). They were written as customers phrase
+# things, not from the lexicon, so negation, idioms and words it does not list
+# are included and the score is an estimate rather than a tautology.
+SENTIMENT_EXAMPLES = [
+    ("thanks so much, that sorted it", "positive"),
+    ("brilliant, the parcel turned up a day early", "positive"),
+    ("really appreciate the quick reply", "positive"),
+    ("the new headphones sound fantastic", "positive"),
+    ("you guys are lifesavers", "positive"),
+    ("love how easy the return was", "positive"),
+    ("great, that's exactly what I needed", "positive"),
+    ("this is ridiculous, third time I'm asking", "negative"),
+    ("the zipper snapped after one day", "negative"),
+    ("I'm not happy with this at all", "negative"),
+    ("still waiting and nobody has called me back", "negative"),
+    ("the screen arrived cracked", "negative"),
+    ("your app keeps crashing when I pay", "negative"),
+    ("this is so annoying", "negative"),
+    ("completely useless answer", "negative"),
+    ("how do I update my billing address", "neutral"),
+    ("what time does the warehouse ship orders", "neutral"),
+    ("can I change the colour before it ships", "neutral"),
+    ("my order number is ORD55555", "neutral"),
+    ("do you deliver to Canada", "neutral"),
+    ("I'd like to cancel my subscription", "neutral"),
+    ("is the blue one in stock", "neutral"),
+]
+
+
+def _fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _save_csr(arrays, prefix, matrix):
+    arrays[f"{prefix}_data"] = matrix.data
+    arrays[f"{prefix}_indices"] = matrix.indices
+    arrays[f"{prefix}_indptr"] = matrix.indptr
+    arrays[f"{prefix}_shape"] = np.array(matrix.shape)
+
+
+def _load_csr(arrays, prefix):
+    from scipy.sparse import csr_matrix
+    return csr_matrix((arrays[f"{prefix}_data"], arrays[f"{prefix}_indices"], arrays[f"{prefix}_indptr"]),
+                      shape=tuple(arrays[f"{prefix}_shape"]))
+
+
+def vectorized_folds(texts, labels, max_features, ngram_range, folds, seed=0, cache_dir=CACHE_DIR):
+    """([(train idx, test idx, X train, X test, vocabulary, idf)] per fold, folds read from the cache)"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.model_selection import StratifiedKFold
+
+    key = _fingerprint(texts, labels, max_features, list(ngram_range), folds, seed)
+    directory = os.path.join(cache_dir, key)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    results = []
+    hits = 0
+    for fold, (train, test) in enumerate(splitter.split(texts, labels)):
+        path = os.path.join(directory, f"fold_{fold}.npz")
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as arrays:
+                results.append((train, test, _load_csr(arrays, 'train'), _load_csr(arrays, 'test'),
+                                arrays['vocabulary'], arrays['idf']))
+            hits += 1
+            continue
+
+        vectorizer = TfidfVectorizer(max_features=max_features, ngram_range=tuple(ngram_range))
+        X_train = vectorizer.fit_transform([texts[i] for i in train])
+        X_test = vectorizer.transform([texts[i] for i in test])
+        vocabulary = np.array(sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get), dtype=str)
+        arrays = {'vocabulary': vocabulary, 'idf': vectorizer.idf_}
+        _save_csr(arrays, 'train', X_train)
+        _save_csr(arrays, 'test', X_test)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp-{os.getpid()}"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+        results.append((train, test, X_train, X_test, vocabulary, vectorizer.idf_))
+    return results, hits
+
+
+def _engine(vocabulary, idf, classifier, max_features, ngram_range):
+    from inference_engine import IntentInferenceEngine
+    from model_artifact import ModelArtifact
+
+    artifact = ModelArtifact(
+        vocabulary=vocabulary, idf=idf, classes=np.asarray(classifier.classes_, dtype=str),
+        class_log_prior=classifier.class_log_prior_, feature_log_prob=classifier.feature_log_prob_,
+        params={
+            'vectorizer': {'lowercase': True, 'token_pattern': r"(?u)\b\w\w+\b",
+                           'ngram_range': list(ngram_range), 'max_features': max_features,
+                           'norm': 'l2', 'smooth_idf': True, 'sublinear_tf': False},
+            'classifier': {'alpha': float(classifier.alpha), 'fit_prior': True},
+        },
+    )
+    return IntentInferenceEngine.from_artifact(artifact)
+
+
+def _latency_us(predict, texts, repeat=3):
+    """Median single-message predict([text]) time (best of repeat passes), in microseconds"""
+    best = None
+    for _ in range(repeat):
+        samples = []
+        for text in texts:
+            started = time.perf_counter_ns()
+            predict([text])
+            samples.append(time.perf_counter_ns() - started)
+        median = statistics.median(samples) / 1000
+        best = median if best is None else min(best, median)
+    return best
+
+
+def _scores(true_labels, predicted, classes):
+    from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+
+    precision, recall, f1, support = precision_recall_fscore_support(
+        true_labels, predicted, labels=classes, zero_division=0)
+    return {
+        'accuracy': float(accuracy_score(true_labels, predicted)),
+        'macro_f1': float(np.mean(f1)),
+        'per_class': {
+            label: {'precision': float(p), 'recall': float(r), 'f1': float(f), 'support': int(n)}
+            for label, p, r, f, n in zip(classes, precision, recall, f1, support)
+        },
+    }
+
+
+def evaluate_config(texts, labels, max_features, ngram_range, alphas, thresholds, folds, seed=0,
+                    cache_dir=CACHE_DIR):
+    """Cross-validate one vectorizer setting over every alpha and threshold"""
+    from sklearn.naive_bayes import MultinomialNB
+
+    rules = CustomerSupportBot(use_ml=False)
+    rule_intents = [rules._rule_based_intent(text) for text in texts]
+    classes = sorted(set(labels))
+    cached, cache_hits = vectorized_folds(texts, labels, max_features, ngram_range, folds, seed, cache_dir)
+
+    results = []
+    for alpha in alphas:
+        predictions = {threshold: [None] * len(texts) for threshold in thresholds}
+        latencies = []
+        for train, test, X_train, X_test, vocabulary, idf in cached:
+            classifier = MultinomialNB(alpha=alpha)
+            classifier.fit(X_train, [labels[i] for i in train])
+            probabilities = classifier.predict_proba(X_test)
+            best = probabilities.argmax(axis=1)
+            confidences = probabilities[np.arange(len(test)), best]
+            for threshold in thresholds:
+                for position, index in enumerate(test):
+                    predictions[threshold][index] = (classifier.classes_[best[position]]
+                                                     if confidences[position] >= threshold
+                                                     else rule_intents[index])
+            engine = _engine(vocabulary, idf, classifier, max_features, ngram_range)
+            latencies.append(_latency_us(engine.predict_proba, [texts[i] for i in test]))
+        for threshold in thresholds:
+            result = {
+                'max_features': max_features,
+                'ngram_range': list(ngram_range),
+                'alpha': alpha,
+                'threshold': threshold,
+                'latency_us': statistics.median(latencies),
+                'cached_folds': cache_hits,
+            }
+            result.update(_scores(labels, [str(p) for p in predictions[threshold]], classes))
+            results.append(result)
+    return results
+
+
+def evaluate_sentiment(examples=SENTIMENT_EXAMPLES):
+    """Per-label precision/recall and per-message latency of the lexicon sentiment model"""
+    texts = [text for text, _ in examples]
+    expected = [label for _, label in examples]
+    predicted = [sentiment_label(positive, negative) for positive, negative in sentiment_scores(texts).tolist()]
+    result = _scores(expected, predicted, ['negative', 'neutral', 'positive'])
+    result['latency_us'] = _latency_us(sentiment_scores, texts)
+    return result
+
+
+def load_corpus(path, text_field='text', label_field='intent'):
+    """(intent examples, sentiment examples) from a JSONL/CSV corpus"""
+    from train_corpus import iter_chunks
+
+    intents = [pair for chunk in iter_chunks(path, text_field=text_field, label_field=label_field)
+               for pair in chunk]
+    sentiments = [pair for chunk in iter_chunks(path, text_field=text_field, label_field='sentiment')
+                  for pair in chunk]
+    return intents, sentiments or SENTIMENT_EXAMPLES
+
+
+def run_sweep(examples, max_features=(250, 500, 1000), ngram_ranges=((1, 1), (1, 2)), alphas=(0.1, 0.5, 1.0),
+              thresholds=(0.2, 0.3, 0.4, 0.5), folds=4, workers=None, cache_dir=CACHE_DIR):
+    """Evaluate every setting, one process-pool job per vectorizer setting; best first"""
+    texts = [text for text, _ in examples]
+    labels = [label for _, label in examples]
+    jobs = [(features, ngram_range) for features in max_features for ngram_range in ngram_ranges]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_config, texts, labels, features, ngram_range, alphas, thresholds,
+                               folds, 0, cache_dir)
+                   for features, ngram_range in jobs]
+        for future in futures:
+            results.extend(future.result())
+    results.sort(key=lambda r: (-r['macro_f1'], -r['accuracy'], r['latency_us']))
+    return results
+
+
+def print_report(results, sentiment, top=10):
+    print("\n" + "="*60)
+    print("📐 INTENT MODEL SWEEP (cross-validated)")
+    print("="*60)
+    print(f"{'features':>8} {'ngrams':>7} {'alpha':>6} {'thresh':>6} {'accuracy':>9} {'macro F1':>9} {'µs/msg':>8}")
+    for r in results[:top]:
+        ngrams = f"{r['ngram_range'][0]}-{r['ngram_range'][1]}"
+        print(f"{r['max_features']:>8} {ngrams:>7} {r['alpha']:>6} {r['threshold']:>6} "
+              f"{r['accuracy']*100:>8.1f}% {r['macro_f1']:>9.3f} {r['latency_us']:>8.1f}")
+
+    best = results[0]
+    print(f"\n🎯 Per-intent results for the best setting "
+          f"(max_features={best['max_features']}, ngram_range={tuple(best['ngram_range'])}, "
+          f"alpha={best['alpha']}, threshold={best['threshold']}, {best['latency_us']:.1f} µs/msg):")
+    _print_per_class(best['per_class'])
+
+    print(f"\n😊 Sentiment lexicon: accuracy {sentiment['accuracy']*100:.1f}%, "
+          f"macro F1 {sentiment['macro_f1']:.3f}, {sentiment['latency_us']:.1f} µs/msg")
+    _print_per_class(sentiment['per_class'])
+    print("="*60 + "\n")
+
+
+def _print_per_class(per_class):
+    print(f"  {'label':<14} {'precision':>9} {'recall':>7} {'support':>8}")
+    for label, scores in per_class.items():
+        print(f"  {label:<14} {scores['precision']:>9.2f} {scores['recall']:>7.2f} {scores['support']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate intent and sentiment models")
+    parser.add_argument('--corpus', help="JSONL/CSV corpus (default: the bot's TRAINING_DATA)")
+    parser.add_argument('--text-field', default='text')
+    parser.add_argument('--label-field', default='intent')
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--max-features', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--ngram-max', type=int, nargs='+', default=[1, 2], help="longest word n-grams to try")
+    parser.add_argument('--alpha', type=float, nargs='+', default=[0.1, 0.5, 1.0])
+    parser.add_argument('--threshold', type=float, nargs='+', default=[0.2, 0.3, 0.4, 0.5])
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="where vectorized folds are cached")
+    parser.add_argument('--json', help="also write all results to this JSON file")
+    args = parser.parse_args()
+
+    if args.corpus:
+        examples, sentiment_examples = load_corpus(args.corpus, args.text_field, args.label_field)
+    else:
+        examples, sentiment_examples = TRAINING_DATA, SENTIMENT_EXAMPLES
+
+    results = run_sweep(examples, args.max_features, [(1, n) for n in args.ngram_max], args.alpha,
+                        args.threshold, args.folds, args.workers, args.cache_dir)
+    sentiment = evaluate_sentiment(sentiment_examples)
+    print_report(results, sentiment)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'intent': results, 'sentiment': sentiment}, f, indent=2)
+        print(f"✓ Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Append-Only Event Log for the Customer Support Chatbot
+Buffered JSONL writer for per-turn and per-session records
+
+Callers only append records to an in-memory buffer; a background thread
+serializes and writes them when the buffer reaches flush_size records or
+every flush_interval seconds, whichever comes first. Files are named
+<prefix>_<YYYYmmdd_HHMMSS>_<n>.jsonl and rotated once they reach max_bytes,
+so a crash loses at most the last unflushed interval. If a background flush
+fails (e.g. the disk is full), the writer reports it, drops that batch
+(counted in records_dropped) and keeps draining, so the buffer stays
+bounded; flush() and close() raise the error to their caller.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class EventLog:
+    def __init__(self, directory='.', prefix='chatbot_events', flush_size=256,
+                 flush_interval=1.0, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.prefix = prefix
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.records_written = 0
+        self.records_dropped = 0
+        self.flush_errors = 0
+        self.files_written = []
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._file = None
+        self._file_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+        self._writer.start()
+
+    def write(self, record):
+        """Queue one JSON-serializable record (no disk I/O on the caller's thread)"""
+        with self._lock:
+            if self._closed:
+                raise ValueError("write to closed EventLog")
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.flush_errors += 1
+                print(f"⚠ Event log flush failed, records dropped: {e!r}")
+
+    def flush(self):
+        """Write everything buffered so far"""
+        # Hold the I/O lock across the swap so concurrent flushes keep record order
+        with self._io_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return
+            written = 0
+            try:
+                lines = [(json.dumps(record, default=str) + "\n").encode('utf-8') for record in records]
+                pending = []
+                for line in lines:
+                    if self._file is None or self._file_bytes >= self.max_bytes:
+                        written += self._write_lines(pending)
+                        self._rotate()
+                    pending.append(line)
+                    self._file_bytes += len(line)
+                written += self._write_lines(pending)
+            except Exception:
+                # The next flush starts a fresh file rather than appending to a broken one
+                self.records_written += written
+                self.records_dropped += len(records) - written
+                self._discard_file()
+                raise
+            self.records_written += written
+
+    def _write_lines(self, lines):
+        count = len(lines)
+        if lines:
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            lines.clear()
+        return count
+
+    def _discard_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f"{self.prefix}_{timestamp}_{len(self.files_written)}.jsonl")
+        self._file = open(path, 'ab')
+        self._file_bytes = 0
+        self.files_written.append(path)
+
+    def close(self):
+        """Stop the writer thread and flush the remaining records"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
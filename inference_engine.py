@@ -0,0 +1,176 @@
+"""
+Pure-NumPy Inference Engine for the Intent Classifier
+Scores TF-IDF + MultinomialNB predictions without going through scikit-learn
+
+For short single messages most of scikit-learn's time goes to input validation
+and sparse-matrix construction. This engine reproduces the same pipeline
+directly: regex tokenization, 1-2-gram vocabulary lookup, idf weighting, L2
+normalization and one dot product against the class log-probabilities.
+
+The vocabulary is a sorted array of terms (feature i is vocabulary[i]) searched
+with np.searchsorted, and the log-probabilities are taken as features x classes,
+so a memory-mapped ModelArtifact is used as is: no per-process dict or
+transposed copy, and forked workers keep sharing the mapped pages.
+"""
+
+import math
+import re
+
+import numpy as np
+
+
+class IntentInferenceEngine:
+    def __init__(self, vocabulary, idf, classes, class_log_prior, feature_log_prob_t,
+                 ngram_range=(1, 2), lowercase=True, token_pattern=r"(?u)\b\w\w+\b",
+                 norm='l2', sublinear_tf=False):
+        if norm not in ('l1', 'l2', None):
+            raise ValueError(f"unsupported norm {norm!r}")
+        # Sorted terms; feature i is vocabulary[i]
+        self.vocabulary = np.asarray(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.class_log_prior = np.asarray(class_log_prior, dtype=np.float64)
+        # Features x classes, so one message's features are a contiguous row gather
+        self.feature_log_prob_t = np.asarray(feature_log_prob_t, dtype=np.float64)
+        self.min_n, self.max_n = ngram_range
+        self.lowercase = lowercase
+        self.token_pattern = re.compile(token_pattern)
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """Build the engine from a ModelArtifact"""
+        params = artifact.params['vectorizer']
+        return cls(
+            vocabulary=artifact.vocabulary,
+            idf=artifact.idf,
+            classes=artifact.classes,
+            class_log_prior=artifact.class_log_prior,
+            feature_log_prob_t=artifact.feature_log_prob_t,
+            ngram_range=tuple(params['ngram_range']),
+            lowercase=params['lowercase'],
+            token_pattern=params['token_pattern'],
+            norm=params['norm'],
+            sublinear_tf=params['sublinear_tf'],
+        )
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, classifier):
+        """Export the engine from a fitted TfidfVectorizer + MultinomialNB pair"""
+        from model_artifact import ModelArtifact
+        return cls.from_artifact(ModelArtifact.from_sklearn(vectorizer, classifier))
+
+    def analyze(self, text):
+        """Word n-grams of a text, in the same order as TfidfVectorizer's analyzer"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        min_n, max_n = self.min_n, self.max_n
+        if max_n == 1:
+            return tokens
+        n_tokens = len(tokens)
+        ngrams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, n_tokens) + 1):
+            for i in range(n_tokens - n + 1):
+                ngrams.append(" ".join(tokens[i:i + n]))
+        return ngrams
+
+    def _lookup(self, terms):
+        """(mask of the terms in the vocabulary, their feature indices)"""
+        vocabulary = self.vocabulary
+        if not terms or not len(vocabulary):
+            return np.zeros(len(terms), dtype=bool), np.zeros(0, dtype=np.intp)
+        terms = np.array(terms, dtype=str)
+        # Searching all but the last term keeps every position a valid index;
+        # a term past the end is compared with the last term
+        positions = np.searchsorted(vocabulary[:-1], terms)
+        found = vocabulary[positions] == terms
+        return found, positions[found]
+
+    def _features(self, text):
+        """(feature indices, normalized tf-idf weights) for one text"""
+        _, indices = self._lookup(self.analyze(text))
+        if not len(indices):
+            return None, None
+        indices.sort()
+        if (indices[1:] == indices[:-1]).any():   # a repeated n-gram
+            indices, counts = np.unique(indices, return_counts=True)
+            weights = counts.astype(np.float64)
+        else:
+            weights = np.ones(len(indices))
+        if self.sublinear_tf:
+            weights = np.log(weights) + 1
+        weights *= self.idf[indices]
+        if self.norm == 'l2':
+            weights /= math.sqrt(weights @ weights)
+        elif self.norm == 'l1':
+            weights /= np.abs(weights).sum()
+        return indices, weights
+
+    def transform(self, texts):
+        """TF-IDF rows as CSR parts (indptr, indices, data)"""
+        terms = []
+        term_rows = []
+        n_rows = 0
+        for text in texts:
+            ngrams = self.analyze(text)
+            terms.extend(ngrams)
+            term_rows.extend([n_rows] * len(ngrams))
+            n_rows += 1
+
+        # One binary search for the whole batch, then (row, feature) pairs
+        # are counted and sorted by row with a single np.unique
+        found, indices = self._lookup(terms)
+        n_features = max(len(self.vocabulary), 1)
+        keys, counts = np.unique(np.asarray(term_rows, dtype=np.intp)[found] * n_features + indices,
+                                 return_counts=True)
+        indices = keys % n_features
+        indptr = np.zeros(n_rows + 1, dtype=np.intp)
+        np.cumsum(np.bincount(keys // n_features, minlength=n_rows), out=indptr[1:])
+        data = counts.astype(np.float64)
+        if self.sublinear_tf:
+            data = np.log(data) + 1
+        data *= self.idf[indices]
+        if self.norm is not None and len(data):
+            starts = indptr[:-1]
+            nonempty = indptr[1:] > starts
+            values = data * data if self.norm == 'l2' else np.abs(data)
+            row_norms = np.add.reduceat(values, starts[nonempty])
+            if self.norm == 'l2':
+                row_norms = np.sqrt(row_norms)
+            data /= np.repeat(row_norms, np.diff(indptr)[nonempty])
+        return indptr, indices, data
+
+    def joint_log_likelihood(self, texts):
+        """Unnormalized class log-probabilities, shape (len(texts), n_classes)"""
+        texts = list(texts)
+        if len(texts) == 1:
+            indices, weights = self._features(texts[0])
+            jll = self.class_log_prior.copy()
+            if indices is not None:
+                jll += weights @ self.feature_log_prob_t[indices]
+            return jll[np.newaxis, :]
+
+        return self.csr_joint_log_likelihood(*self.transform(texts))
+
+    def csr_joint_log_likelihood(self, indptr, indices, data):
+        """Class log-probabilities for rows already vectorized by transform()"""
+        jll = np.tile(self.class_log_prior, (len(indptr) - 1, 1))
+        starts = indptr[:-1]
+        nonempty = indptr[1:] > starts
+        if nonempty.any():
+            contributions = data[:, np.newaxis] * self.feature_log_prob_t[indices]
+            jll[nonempty] += np.add.reduceat(contributions, starts[nonempty], axis=0)
+        return jll
+
+    def predict_proba(self, texts):
+        """Class probabilities, matching MultinomialNB.predict_proba"""
+        jll = self.joint_log_likelihood(texts)
+        jll -= jll.max(axis=1, keepdims=True)
+        probabilities = np.exp(jll)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+    def predict(self, texts):
+        return self.classes[self.joint_log_likelihood(texts).argmax(axis=1)]
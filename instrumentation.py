@@ -0,0 +1,154 @@
+"""
+Hot-Path Instrumentation for the Customer Support Chatbot
+Per-stage spans and model events, dispatched to pluggable sinks
+
+The bot times its stages (detect_intent, detect_sentiment,
+should_escalate_to_human, generate_response and the whole get_response) and
+reports intent confidence and rule-fallback events. Nothing is measured unless
+an Instrumentation with at least one sink is attached:
+
+    counters = CounterSink()
+    bot = CustomerSupportBot(instrumentation=Instrumentation([counters]))
+    ...
+    print(counters.snapshot())
+
+Sinks implement any of span_started(stage), span_finished(stage, duration_ns)
+and event(name, fields); the Sink base class provides no-op defaults.
+"""
+
+import cProfile
+import os
+import threading
+import time
+from collections import defaultdict
+
+from latency_histogram import LatencyHistogram
+
+
+class Sink:
+    def span_started(self, stage):
+        pass
+
+    def span_finished(self, stage, duration_ns):
+        pass
+
+    def event(self, name, fields):
+        pass
+
+
+class Instrumentation:
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def call(self, stage, func, *args):
+        """Run func(*args) inside a span named stage"""
+        sinks = self.sinks
+        for sink in sinks:
+            sink.span_started(stage)
+        start = time.perf_counter_ns()
+        try:
+            return func(*args)
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            for sink in sinks:
+                sink.span_finished(stage, duration_ns)
+
+    def event(self, name, **fields):
+        for sink in self.sinks:
+            sink.event(name, fields)
+
+
+class CounterSink(Sink):
+    """In-memory span latency histograms and event counts"""
+
+    def __init__(self):
+        self.spans = defaultdict(LatencyHistogram)
+        self.events = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def span_finished(self, stage, duration_ns):
+        with self._lock:
+            self.spans[stage].record(duration_ns)
+
+    def event(self, name, fields):
+        with self._lock:
+            self.events[name] += 1
+            if name == 'fallback':
+                self.events[f"fallback:{fields.get('reason')}"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'spans': {stage: histogram.summary_ms() for stage, histogram in self.spans.items()},
+                'events': dict(self.events),
+            }
+
+
+class TraceSink(Sink):
+    """Write every span and event as a JSONL record through an EventLog"""
+
+    def __init__(self, event_log, stages=None):
+        self.event_log = event_log
+        self.stages = set(stages) if stages is not None else None
+
+    def span_finished(self, stage, duration_ns):
+        if self.stages is None or stage in self.stages:
+            self.event_log.write({'type': 'span', 'stage': stage, 'duration_ns': duration_ns,
+                                  'time': time.time()})
+
+    def event(self, name, fields):
+        self.event_log.write(dict(fields, type='event', event=name, time=time.time()))
+
+
+class SamplingProfilerSink(Sink):
+    """Profile a sample of requests with cProfile and dump them to .prof files.
+
+    Every `every`-th request on the stage is profiled; with slow_ms set, a
+    request slower than that also arms profiling of the next one. At most
+    max_profiles files are written (view them with python -m pstats).
+    """
+
+    def __init__(self, output_dir='profiles', stage='get_response', every=1000, slow_ms=None,
+                 max_profiles=20):
+        self.output_dir = output_dir
+        self.stage = stage
+        self.every = every
+        self.slow_ms = slow_ms
+        self.max_profiles = max_profiles
+        self.requests = 0
+        self.profiles_written = []
+        self._armed = False
+        self._profiler = None
+        self._owner = None
+
+    def span_started(self, stage):
+        if stage != self.stage or self._profiler is not None:
+            return
+        self.requests += 1
+        if len(self.profiles_written) >= self.max_profiles:
+            return
+        if self._armed or (self.every and self.requests % self.every == 0):
+            self._armed = False
+            self._owner = threading.get_ident()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def span_finished(self, stage, duration_ns):
+        if stage != self.stage:
+            return
+        if self._profiler is not None and self._owner == threading.get_ident():
+            self._profiler.disable()
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{self.stage}_{self.requests}.prof")
+            self._profiler.dump_stats(path)
+            self.profiles_written.append(path)
+            self._profiler = None
+        elif self.slow_ms is not None and duration_ns > self.slow_ms * 1e6:
+            self._armed = True
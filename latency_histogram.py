@@ -0,0 +1,106 @@
+"""
+Streaming Latency Histogram
+Fixed-memory, log-bucketed latency recording with mergeable percentiles
+
+Samples are nanosecond integers (from time.perf_counter_ns). Bucket i covers
+[2^(i/k), 2^((i+1)/k)) ns for k buckets per doubling, so with the default
+k = 16 every reported percentile is within about 2.2% of the true sample.
+Histograms with the same layout can be merged across sessions and processes
+through to_dict()/from_dict().
+"""
+
+import math
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_per_doubling=16, max_exponent=40):
+        # 2^40 ns is about 18 minutes; slower samples land in the last bucket
+        self.buckets_per_doubling = buckets_per_doubling
+        self.max_exponent = max_exponent
+        self.counts = [0] * (buckets_per_doubling * max_exponent + 1)
+        self.count = 0
+        self.sum_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def record(self, duration_ns):
+        """Add one sample, in nanoseconds"""
+        duration_ns = max(int(duration_ns), 1)
+        index = min(int(math.log2(duration_ns) * self.buckets_per_doubling), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ns += duration_ns
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if self.max_ns is None or duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def _bucket_value(self, index):
+        """Geometric midpoint of a bucket, in nanoseconds"""
+        return 2 ** ((index + 0.5) / self.buckets_per_doubling)
+
+    def percentile(self, percent):
+        """Approximate percentile (0-100) in nanoseconds, or None when empty"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min_ns), self.max_ns)
+        return self.max_ns
+
+    @property
+    def mean_ns(self):
+        return self.sum_ns / self.count if self.count else None
+
+    def merge(self, other):
+        """Add another histogram's samples into this one"""
+        if (other.buckets_per_doubling, other.max_exponent) != (self.buckets_per_doubling, self.max_exponent):
+            raise ValueError("cannot merge histograms with different bucket layouts")
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.sum_ns += other.sum_ns
+        if other.count:
+            self.min_ns = other.min_ns if self.min_ns is None else min(self.min_ns, other.min_ns)
+            self.max_ns = other.max_ns if self.max_ns is None else max(self.max_ns, other.max_ns)
+        return self
+
+    def summary_ms(self):
+        """count, mean, p50/p90/p99 and max in milliseconds"""
+        def to_ms(value):
+            return value / 1e6 if value is not None else 0.0
+        return {
+            'count': self.count,
+            'mean_ms': to_ms(self.mean_ns),
+            'p50_ms': to_ms(self.percentile(50)),
+            'p90_ms': to_ms(self.percentile(90)),
+            'p99_ms': to_ms(self.percentile(99)),
+            'max_ms': to_ms(self.max_ns),
+        }
+
+    def to_dict(self):
+        """JSON-friendly form; only non-empty buckets are stored"""
+        return {
+            'buckets_per_doubling': self.buckets_per_doubling,
+            'max_exponent': self.max_exponent,
+            'buckets': {str(index): c for index, c in enumerate(self.counts) if c},
+            'count': self.count,
+            'sum_ns': self.sum_ns,
+            'min_ns': self.min_ns,
+            'max_ns': self.max_ns,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['buckets_per_doubling'], data['max_exponent'])
+        for index, bucket_count in data['buckets'].items():
+            histogram.counts[int(index)] = bucket_count
+        histogram.count = data['count']
+        histogram.sum_ns = data['sum_ns']
+        histogram.min_ns = data['min_ns']
+        histogram.max_ns = data['max_ns']
+        return histogram
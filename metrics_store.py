@@ -0,0 +1,249 @@
+"""
+Columnar Metrics Store for Chatbot Sessions
+Ingests chatbot_metrics_*.json files once and answers cross-session trends
+
+The store is a directory of NumPy column files plus an index.json listing the
+metrics files already ingested (with their size and modification time), so
+re-running an analysis only parses files that are new or have changed, and
+rows for files that have since been deleted are dropped. Saves go through
+versioned_dir, which swaps in each new copy of these files atomically:
+    index.json              ingested files (one per session row) and intent names
+    <column>.npy            one value per session (see SESSION_COLUMNS)
+    intent_*.npy            (session row, intent id, count) triplets
+
+Usage:
+    store = MetricsStore()
+    store.ingest(glob.glob('chatbot_metrics_*.json'))
+    store.save()
+    trends = store.daily_trends()
+"""
+
+import json
+import os
+from datetime import date, datetime
+
+import numpy as np
+
+from versioned_dir import current_version, publish, read_current
+
+
+FORMAT_VERSION = 1
+STORE_DIR = 'chatbot_metrics_store'
+
+# Per-session columns and their dtypes; missing values are NaN in float columns
+SESSION_COLUMNS = {
+    'day': np.int32,                        # days since 1970-01-01 of the session start
+    'start_time': np.float64,               # POSIX timestamp of the session start
+    'total_interactions': np.int64,
+    'escalations_to_human': np.int64,
+    'escalation_rate': np.float64,
+    'average_response_time_ms': np.float64,
+    'p50_response_time_ms': np.float64,
+    'p99_response_time_ms': np.float64,
+    'average_satisfaction': np.float64,
+    'satisfaction_count': np.int64,
+    'positive': np.int64,
+    'neutral': np.int64,
+    'negative': np.int64,
+}
+INTENT_COLUMNS = {
+    'intent_row': np.int64,
+    'intent_id': np.int32,
+    'intent_count': np.int64,
+}
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _session_row(data):
+    """Column values for one parsed metrics file"""
+    metrics = data['metrics']
+    started = datetime.fromisoformat(data['session_info']['start_time'])
+    percentiles = metrics.get('response_time_percentiles_ms', {})
+    sentiments = metrics.get('sentiment_distribution', {})
+    return {
+        'day': started.date().toordinal() - _EPOCH_ORDINAL,
+        'start_time': started.timestamp(),
+        'total_interactions': metrics['total_interactions'],
+        'escalations_to_human': metrics['escalations_to_human'],
+        'escalation_rate': metrics['escalation_rate'],
+        'average_response_time_ms': metrics['average_response_time_ms'],
+        'p50_response_time_ms': percentiles.get('p50', np.nan),
+        'p99_response_time_ms': percentiles.get('p99', np.nan),
+        'average_satisfaction': metrics['average_satisfaction'],
+        'satisfaction_count': len(metrics.get('satisfaction_scores', [])),
+        'positive': sentiments.get('positive', 0),
+        'neutral': sentiments.get('neutral', 0),
+        'negative': sentiments.get('negative', 0),
+    }
+
+
+def _dates(days):
+    return [date.fromordinal(int(day) + _EPOCH_ORDINAL) for day in days]
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+class MetricsStore:
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        self.files = []          # [path, mtime_ns, size] per session row
+        self.intents = []        # intent names, indexed by intent id
+        self.columns = {name: np.zeros(0, dtype) for name, dtype in SESSION_COLUMNS.items()}
+        self.columns.update({name: np.zeros(0, dtype) for name, dtype in INTENT_COLUMNS.items()})
+        if os.path.exists(os.path.join(current_version(path), 'index.json')):
+            read_current(path, self._load)
+
+    def __len__(self):
+        return len(self.files)
+
+    def _load(self, directory):
+        with open(os.path.join(directory, 'index.json'), 'r') as f:
+            index = json.load(f)
+        if index.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"unsupported metrics store version {index.get('format_version')!r}")
+        self.files = index['files']
+        self.intents = index['intents']
+        for name in self.columns:
+            self.columns[name] = np.load(os.path.join(directory, f"{name}.npy"), allow_pickle=False)
+
+    def save(self):
+        """Write the store as a new version of its directory and atomically make it current"""
+        publish(self.path, self._write)
+
+    def _write(self, directory):
+        for name, column in self.columns.items():
+            np.save(os.path.join(directory, f"{name}.npy"), column, allow_pickle=False)
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump({'format_version': FORMAT_VERSION, 'files': self.files, 'intents': self.intents}, f)
+
+    def ingest(self, filenames):
+        """Add new or changed metrics files and drop deleted ones; returns the number of files parsed"""
+        rows = {os.path.abspath(path): row for row, (path, _, _) in enumerate(self.files)}
+        intent_ids = {name: i for i, name in enumerate(self.intents)}
+        stale = [row for path, row in rows.items() if not os.path.exists(path)]
+        seen = set()
+        new_files, new_rows, new_intents = [], [], []
+
+        for filename in filenames:
+            path = os.path.abspath(filename)
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            row = rows.get(path)
+            if row is not None and self.files[row][1:] == [stat.st_mtime_ns, stat.st_size]:
+                continue
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                values = _session_row(data)
+                intents = data['metrics']['intents_detected']
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠ Skipping {filename}: {e}")
+                continue
+            if row is not None:
+                stale.append(row)
+            session = len(new_rows)
+            for intent, count in intents.items():
+                if intent not in intent_ids:
+                    intent_ids[intent] = len(self.intents)
+                    self.intents.append(intent)
+                new_intents.append((session, intent_ids[intent], count))
+            new_files.append([path, stat.st_mtime_ns, stat.st_size])
+            new_rows.append(values)
+
+        if stale:
+            self._drop_rows(stale)
+        if new_rows:
+            offset = len(self.files)
+            self.files.extend(new_files)
+            for name, dtype in SESSION_COLUMNS.items():
+                added = np.array([values[name] for values in new_rows], dtype=dtype)
+                self.columns[name] = np.concatenate([self.columns[name], added])
+            added = np.array(new_intents, dtype=np.int64).reshape(-1, 3)
+            for i, (name, dtype) in enumerate(INTENT_COLUMNS.items()):
+                column = added[:, i] + (offset if name == 'intent_row' else 0)
+                self.columns[name] = np.concatenate([self.columns[name], column.astype(dtype)])
+        return len(new_rows)
+
+    def _drop_rows(self, rows):
+        """Remove session rows (and their intent counts), e.g. for re-written files"""
+        keep = np.ones(len(self.files), dtype=bool)
+        keep[rows] = False
+        self.files = [entry for entry, kept in zip(self.files, keep) if kept]
+        for name in SESSION_COLUMNS:
+            self.columns[name] = self.columns[name][keep]
+        intent_keep = keep[self.columns['intent_row']]
+        new_row = np.cumsum(keep) - 1
+        for name in INTENT_COLUMNS:
+            self.columns[name] = self.columns[name][intent_keep]
+        self.columns['intent_row'] = new_row[self.columns['intent_row']]
+
+    def sessions(self, filenames=None):
+        """Session columns in start-time order, optionally for the given files only"""
+        if filenames is None:
+            rows = np.arange(len(self.files))
+        else:
+            index = {path: row for row, (path, _, _) in enumerate(self.files)}
+            rows = np.array([index[os.path.abspath(f)] for f in filenames if os.path.abspath(f) in index],
+                            dtype=np.intp)
+        rows = rows[np.argsort(self.columns['start_time'][rows], kind='stable')]
+        table = {name: self.columns[name][rows] for name in SESSION_COLUMNS}
+        table['file'] = [self.files[row][0] for row in rows]
+        return table
+
+    def summary(self):
+        """Aggregate statistics across all sessions (session averages, unweighted)"""
+        columns = self.columns
+        rated = columns['average_satisfaction'] > 0
+        return {
+            'sessions': len(self.files),
+            'total_interactions': int(columns['total_interactions'].sum()),
+            'average_satisfaction': float(columns['average_satisfaction'][rated].mean()) if rated.any() else float('nan'),
+            'average_escalation_rate': float(columns['escalation_rate'].mean()) if len(self.files) else float('nan'),
+            'average_response_time_ms': float(columns['average_response_time_ms'].mean()) if len(self.files) else float('nan'),
+        }
+
+    def daily_trends(self):
+        """Per-day escalation rate, satisfaction and latency.
+
+        Rates are weighted by interactions (latency) and ratings (satisfaction),
+        so busy sessions count more than short ones.
+        """
+        columns = self.columns
+        days, day_index = np.unique(columns['day'], return_inverse=True)
+
+        def per_day(values):
+            return np.bincount(day_index, weights=values, minlength=len(days))
+
+        interactions = per_day(columns['total_interactions'])
+        ratings = per_day(columns['satisfaction_count'])
+        p99 = columns['p99_response_time_ms']
+        has_p99 = ~np.isnan(p99)
+        max_p99 = np.full(len(days), -np.inf)
+        np.maximum.at(max_p99, day_index[has_p99], p99[has_p99])
+        max_p99[np.isneginf(max_p99)] = np.nan
+        return {
+            'days': _dates(days),
+            'sessions': np.bincount(day_index, minlength=len(days)),
+            'interactions': interactions.astype(np.int64),
+            'escalation_rate': _ratio(per_day(columns['escalations_to_human']), interactions),
+            'average_satisfaction': _ratio(per_day(columns['average_satisfaction'] * columns['satisfaction_count']), ratings),
+            'average_response_time_ms': _ratio(per_day(columns['average_response_time_ms'] * columns['total_interactions']), interactions),
+            'max_p99_response_time_ms': max_p99,
+        }
+
+    def intent_trends(self):
+        """(days, intent names, counts) with counts shaped (days, intents)"""
+        columns = self.columns
+        days, day_index = np.unique(columns['day'], return_inverse=True)
+        counts = np.zeros((len(days), len(self.intents)), dtype=np.int64)
+        np.add.at(counts, (day_index[columns['intent_row']], columns['intent_id']), columns['intent_count'])
+        return _dates(days), list(self.intents), counts
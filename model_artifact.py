@@ -0,0 +1,200 @@
+"""
+Compact Model Artifact for the Intent Classifier
+Versioned, memory-mappable replacement for chatbot_model.pkl
+
+An artifact is a directory of raw .npy arrays plus a JSON manifest:
+    manifest.json           format version, model parameters and SHA-256 checksums
+    vocabulary.npy          n-gram terms, sorted; feature i is vocabulary[i]
+    idf.npy                 TF-IDF inverse document frequencies
+    classes.npy             intent labels
+    class_log_prior.npy     MultinomialNB class log-priors
+    feature_log_prob_t.npy  MultinomialNB feature log-probabilities (features x classes)
+
+Arrays are memory-mapped read-only on load, so forked workers share the same
+pages instead of each unpickling its own copy of the model. They are stored in
+the layout the inference engine scores with (a sorted vocabulary it binary
+searches, log-probabilities already transposed), so it uses the mapped arrays
+as is. Version 1 artifacts (feature_log_prob.npy, classes x features) still
+load, but each process then makes its own transposed copy. Saves go through
+versioned_dir: the files above are written to a new version subdirectory and
+a CURRENT pointer is swapped atomically, so a reader never finds a partial
+or missing artifact.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from versioned_dir import publish, read_current
+
+
+FORMAT_VERSION = 2
+ARRAY_NAMES = ('vocabulary', 'idf', 'classes', 'class_log_prior', 'feature_log_prob_t')
+V1_ARRAY_NAMES = ('vocabulary', 'idf', 'classes', 'class_log_prior', 'feature_log_prob')
+
+# Vectorizer settings the artifact can represent; anything else is rejected on export
+VECTORIZER_DEFAULTS = {
+    'analyzer': 'word', 'tokenizer': None, 'preprocessor': None, 'stop_words': None,
+    'strip_accents': None, 'binary': False, 'use_idf': True,
+}
+
+
+class ModelArtifactError(ValueError):
+    """Raised when an artifact is missing, corrupt or of an unsupported version"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelArtifact:
+    def __init__(self, vocabulary, idf, classes, class_log_prior, feature_log_prob, params):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.classes = classes
+        self.class_log_prior = class_log_prior
+        # Kept as features x classes; feature_log_prob is the transposed view
+        self.feature_log_prob_t = feature_log_prob.T
+        self.params = params
+
+    @property
+    def feature_log_prob(self):
+        """Feature log-probabilities, classes x features (a view, not a copy)"""
+        return self.feature_log_prob_t.T
+
+    @property
+    def n_features(self):
+        return len(self.vocabulary)
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, classifier):
+        """Export a fitted TfidfVectorizer + MultinomialNB pair"""
+        vectorizer_params = vectorizer.get_params()
+        for name, expected in VECTORIZER_DEFAULTS.items():
+            if vectorizer_params[name] != expected:
+                raise ModelArtifactError(f"unsupported vectorizer setting {name}={vectorizer_params[name]!r}")
+
+        # Features in term order (fitted vectorizers already number them so)
+        terms = sorted(vectorizer.vocabulary_)
+        order = np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.intp)
+        params = {
+            'vectorizer': {
+                'lowercase': vectorizer.lowercase,
+                'token_pattern': vectorizer.token_pattern,
+                'ngram_range': list(vectorizer.ngram_range),
+                'max_features': vectorizer.max_features,
+                'norm': vectorizer.norm,
+                'smooth_idf': vectorizer.smooth_idf,
+                'sublinear_tf': vectorizer.sublinear_tf,
+            },
+            'classifier': {
+                'alpha': float(classifier.alpha),
+                'fit_prior': classifier.fit_prior,
+            },
+        }
+        return cls(
+            vocabulary=np.array(terms, dtype=str),
+            idf=np.asarray(vectorizer.idf_, dtype=np.float64)[order],
+            classes=np.asarray(classifier.classes_, dtype=str),
+            class_log_prior=np.asarray(classifier.class_log_prior_, dtype=np.float64),
+            feature_log_prob=np.asarray(classifier.feature_log_prob_, dtype=np.float64)[:, order],
+            params=params,
+        )
+
+    def to_sklearn(self):
+        """Rebuild (vectorizer, classifier) scikit-learn objects from the arrays"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+
+        vectorizer_params = dict(self.params['vectorizer'])
+        vectorizer_params['ngram_range'] = tuple(vectorizer_params['ngram_range'])
+        vectorizer = TfidfVectorizer(**vectorizer_params)
+        vectorizer.vocabulary_ = {str(term): index for index, term in enumerate(self.vocabulary)}
+        vectorizer.idf_ = self.idf
+
+        classifier = MultinomialNB(**self.params['classifier'])
+        classifier.classes_ = self.classes
+        classifier.class_log_prior_ = self.class_log_prior
+        classifier.feature_log_prob_ = self.feature_log_prob
+        classifier.n_features_in_ = self.n_features
+        return vectorizer, classifier
+
+    def save(self, path):
+        """Write the artifact as a new version of path and atomically make it current"""
+        publish(path, self._write)
+
+    def _write(self, directory):
+        files = {}
+        for name in ARRAY_NAMES:
+            array = np.ascontiguousarray(getattr(self, name))
+            filename = f"{name}.npy"
+            np.save(os.path.join(directory, filename), array, allow_pickle=False)
+            files[name] = {
+                'file': filename,
+                'sha256': _sha256(os.path.join(directory, filename)),
+                'shape': list(array.shape),
+                'dtype': array.dtype.str,
+            }
+        manifest = {'format_version': FORMAT_VERSION, 'params': self.params, 'arrays': files}
+        with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True, verify=True):
+        """Load an artifact, memory-mapping the arrays read-only and checking checksums.
+
+        Any missing file, malformed manifest or inconsistent array raises
+        ModelArtifactError, so callers can fall back to retraining.
+        """
+        try:
+            return read_current(path, lambda version: cls._load(version, mmap, verify))
+        except ModelArtifactError:
+            raise
+        except (OSError, KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ModelArtifactError(f"invalid artifact {path}: {e!r}") from e
+
+    @classmethod
+    def _load(cls, path, mmap, verify):
+        manifest_path = os.path.join(path, 'manifest.json')
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ModelArtifactError(f"cannot read {manifest_path}: {e}")
+
+        version = manifest.get('format_version')
+        if version not in (1, FORMAT_VERSION):
+            raise ModelArtifactError(f"unsupported artifact format version {version!r}")
+
+        arrays = {}
+        for name in (ARRAY_NAMES if version == FORMAT_VERSION else V1_ARRAY_NAMES):
+            entry = manifest['arrays'].get(name)
+            if entry is None:
+                raise ModelArtifactError(f"artifact is missing array '{name}'")
+            array_path = os.path.join(path, entry['file'])
+            if verify and _sha256(array_path) != entry['sha256']:
+                raise ModelArtifactError(f"checksum mismatch for {array_path}")
+            try:
+                array = np.load(array_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+            except (OSError, ValueError) as e:
+                raise ModelArtifactError(f"cannot load {array_path}: {e}")
+            if list(array.shape) != entry['shape']:
+                raise ModelArtifactError(f"shape mismatch for {array_path}")
+            arrays[name] = array
+
+        if 'feature_log_prob_t' in arrays:
+            arrays['feature_log_prob'] = arrays.pop('feature_log_prob_t').T
+        n_classes, n_features = arrays['feature_log_prob'].shape
+        if (len(arrays['vocabulary']) != n_features or len(arrays['idf']) != n_features
+                or len(arrays['classes']) != n_classes or len(arrays['class_log_prior']) != n_classes):
+            raise ModelArtifactError("artifact arrays have inconsistent sizes")
+        vocabulary = arrays['vocabulary']
+        if not (vocabulary[1:] > vocabulary[:-1]).all():
+            raise ModelArtifactError("artifact vocabulary is not sorted")
+        return cls(params=manifest['params'], **arrays)
@@ -0,0 +1,77 @@
+"""
+Online Learning for the Intent Classifier
+Folds newly labelled turns into a live multinomial Naive Bayes model
+
+Features come from a HashingVectorizer, so there is no vocabulary to refit:
+a new word simply lands in its hash bucket. Each update costs
+O(batch size + classes x n_features), independent of how much the model has
+already seen. The model keeps its per-class feature counts (updated in place,
+only by the updating thread) and publishes the coefficients derived from them
+as one (classes, class log-prior, feature log-probabilities) tuple, which an
+update replaces in a single assignment: predictions running on other threads
+never see a half-updated model, and no copy of the estimator is made.
+"""
+
+import threading
+
+import numpy as np
+
+
+class OnlineIntentModel:
+    def __init__(self, classes, n_features=2 ** 16, ngram_range=(1, 2), alpha=1.0):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.classes = sorted(classes)
+        self._class_index = {label: index for index, label in enumerate(self.classes)}
+        # Non-negative counts (alternate_sign=False) as multinomial Naive Bayes requires
+        self.vectorizer = HashingVectorizer(n_features=n_features, ngram_range=ngram_range,
+                                            alternate_sign=False, norm='l2')
+        self.alpha = alpha
+        self.feature_count = np.zeros((len(self.classes), n_features))
+        self.class_count = np.zeros(len(self.classes))
+        self.samples_seen = 0
+        self.updates = 0
+        self._update_lock = threading.Lock()
+        self._coefficients = self._derive_coefficients()
+
+    def _derive_coefficients(self):
+        """(classes, class log-prior, feature log-probabilities) from the current counts,
+        computed as MultinomialNB does (fit_prior=True)"""
+        feature_log_prob = self.feature_count + self.alpha
+        totals = feature_log_prob.sum(axis=1, keepdims=True)
+        np.log(feature_log_prob, out=feature_log_prob)
+        feature_log_prob -= np.log(totals)
+        samples = self.class_count.sum()
+        if samples:
+            with np.errstate(divide='ignore'):
+                class_log_prior = np.log(self.class_count) - np.log(samples)
+        else:
+            class_log_prior = np.full(len(self.classes), -np.log(len(self.classes)))
+        return np.array(self.classes), class_log_prior, feature_log_prob
+
+    def partial_fit(self, texts, labels):
+        """Fold a batch of labelled texts into the model"""
+        texts = list(texts)
+        labels = list(labels)
+        unknown = set(labels) - set(self.classes)
+        if unknown:
+            raise ValueError(f"unknown intent label(s): {', '.join(sorted(unknown))}")
+        if not texts:
+            return
+        features = self.vectorizer.transform(texts).tocoo()
+        rows = np.array([self._class_index[label] for label in labels])
+        with self._update_lock:
+            np.add.at(self.feature_count, (rows[features.row], features.col), features.data)
+            self.class_count += np.bincount(rows, minlength=len(self.classes))
+            self._coefficients = self._derive_coefficients()
+            self.samples_seen += len(texts)
+            self.updates += 1
+
+    def predict_proba(self, texts):
+        """(class probabilities, class labels) for a batch of texts"""
+        classes, class_log_prior, feature_log_prob = self._coefficients
+        joint_log_likelihood = self.vectorizer.transform(texts) @ feature_log_prob.T + class_log_prior
+        joint_log_likelihood -= joint_log_likelihood.max(axis=1, keepdims=True)
+        probabilities = np.exp(joint_log_likelihood)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities, classes
@@ -0,0 +1,224 @@
+"""
+Offline Traffic Replay for the Customer Support Chatbot
+Streams a JSONL file of {"session_id", "text"} records through the bot in parallel
+
+Usage:
+    python replay_traffic.py traffic.jsonl responses.jsonl --workers 8
+
+Records are sharded by session id across a process pool, so every session is
+handled by one worker and keeps its original message order. The input is read
+line by line and only a few chunks per worker are in flight at any time, so
+arbitrarily large files replay in bounded memory. If a worker fails (an
+exception, or the process dies), the other workers are stopped and replay()
+raises ReplayError instead of waiting for the missing results.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+from chatbot import CustomerSupportBot, SessionManager
+from latency_histogram import LatencyHistogram
+
+
+# How often blocked queue operations wake up to check for failed workers
+POLL_SECONDS = 0.5
+
+
+class ReplayError(RuntimeError):
+    """A replay worker failed, so the replay was aborted"""
+
+
+def _shard_for(session_id, workers):
+    """Stable shard index for a session id (independent of PYTHONHASHSEED)"""
+    return zlib.crc32(session_id.encode('utf-8')) % workers
+
+
+def _replay_worker(shard, in_queue, out_queue, use_ml, intent_cache_size):
+    """Worker process: answer chunks of one shard's records in order"""
+    try:
+        _answer_shard(in_queue, out_queue, use_ml, intent_cache_size)
+    except Exception:
+        # Error marker: the writer stops the replay instead of waiting for this shard
+        out_queue.put(('error', shard, traceback.format_exc()))
+
+
+def _answer_shard(in_queue, out_queue, use_ml, intent_cache_size):
+    bot = CustomerSupportBot(use_ml=use_ml, intent_cache_size=intent_cache_size)
+    manager = SessionManager(bot, ttl_seconds=None)
+    while True:
+        chunk = in_queue.get()
+        if chunk is None:
+            break
+        results = manager.respond_many(chunk)
+        out_queue.put([
+            {
+                'session_id': session_id,
+                'text': text,
+                'response': response,
+                'intent': str(analysis.intent),
+                'sentiment': analysis.sentiment,
+                'escalated': bool(analysis.escalation_reasons),
+                'escalation_reasons': analysis.escalation_reasons,
+            }
+            for (session_id, text), (response, analysis) in zip(chunk, results)
+        ])
+    # The end-of-shard marker carries the worker's response-time histogram
+    out_queue.put(bot.metrics['response_latency'].to_dict())
+
+
+def _dead_worker(processes):
+    """Description of the first worker that died without reporting, else None"""
+    for shard, process in enumerate(processes):
+        if process.exitcode not in (None, 0):
+            return f"worker {shard} exited with code {process.exitcode}"
+    return None
+
+
+def _write_results(out_queue, output_file, processes, counters):
+    """Writer thread: write result chunks until every worker has finished.
+
+    Stops early, recording counters['error'], when a worker reports an error
+    or dies, or when the main thread records an error of its own.
+    """
+    finished = 0
+    try:
+        while finished < len(processes) and 'error' not in counters:
+            try:
+                records = out_queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                error = _dead_worker(processes)
+                if error is not None:
+                    counters['error'] = error
+                continue
+            if isinstance(records, tuple):
+                _, shard, error = records
+                counters['error'] = f"worker {shard} failed:\n{error}"
+            elif isinstance(records, dict):
+                counters['latency'].merge(LatencyHistogram.from_dict(records))
+                finished += 1
+            else:
+                output_file.write("".join(json.dumps(record) + "\n" for record in records))
+                counters['written'] += len(records)
+    except Exception as e:
+        counters['error'] = f"writing results failed: {e}"
+
+
+def _put(in_queue, item, counters):
+    """Queue a chunk for a worker, giving up once the replay has failed"""
+    while True:
+        try:
+            in_queue.put(item, timeout=POLL_SECONDS)
+            return
+        except queue.Full:
+            if 'error' in counters:
+                raise ReplayError(counters['error'])
+
+
+def iter_records(input_path, counters):
+    """Yield (session_id, text) pairs from a JSONL file, skipping malformed lines"""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                yield str(record['session_id']), str(record['text'])
+            except (ValueError, KeyError, TypeError):
+                counters['skipped'] += 1
+
+
+def replay(input_path, output_path, workers=None, chunk_size=256, use_ml=True, intent_cache_size=0):
+    """Replay a JSONL traffic file and write one result record per message"""
+    workers = workers or os.cpu_count() or 1
+    counters = {'read': 0, 'written': 0, 'skipped': 0, 'latency': LatencyHistogram()}
+    in_queues = [multiprocessing.Queue(maxsize=4) for _ in range(workers)]
+    out_queue = multiprocessing.Queue(maxsize=4 * workers)
+    processes = [
+        multiprocessing.Process(target=_replay_worker, daemon=True,
+                                args=(i, in_queues[i], out_queue, use_ml, intent_cache_size))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    start_time = time.perf_counter()
+    try:
+        with open(output_path, 'w', encoding='utf-8') as output_file:
+            writer = threading.Thread(target=_write_results, args=(out_queue, output_file, processes, counters))
+            writer.start()
+            try:
+                buffers = [[] for _ in range(workers)]
+                for session_id, text in iter_records(input_path, counters):
+                    counters['read'] += 1
+                    shard = _shard_for(session_id, workers)
+                    buffers[shard].append((session_id, text))
+                    if len(buffers[shard]) >= chunk_size:
+                        _put(in_queues[shard], buffers[shard], counters)
+                        buffers[shard] = []
+                for shard, buffer in enumerate(buffers):
+                    if buffer:
+                        _put(in_queues[shard], buffer, counters)
+                    _put(in_queues[shard], None, counters)
+            except BaseException as e:
+                counters.setdefault('error', f"replay interrupted: {e!r}")
+                raise
+            finally:
+                writer.join()
+    finally:
+        if 'error' in counters:
+            for process in processes:
+                process.terminate()
+            # Chunks still buffered for stopped workers must not block interpreter exit
+            for in_queue in in_queues:
+                in_queue.cancel_join_thread()
+        for process in processes:
+            process.join()
+    if 'error' in counters:
+        raise ReplayError(counters['error'])
+    elapsed = time.perf_counter() - start_time
+
+    counters['elapsed_seconds'] = elapsed
+    counters['messages_per_second'] = counters['written'] / elapsed if elapsed > 0 else 0.0
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay JSONL chatbot traffic in parallel")
+    parser.add_argument('input', help="JSONL file of {session_id, text} records")
+    parser.add_argument('output', help="JSONL file to write responses to")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=256, help="records sent to a worker at once")
+    parser.add_argument('--rules-only', action='store_true', help="disable the ML intent model")
+    parser.add_argument('--intent-cache-size', type=int, default=0, help="LRU intent cache entries (0 disables)")
+    args = parser.parse_args()
+
+    try:
+        stats = replay(args.input, args.output, args.workers, args.chunk_size,
+                       use_ml=not args.rules_only, intent_cache_size=args.intent_cache_size)
+    except ReplayError as e:
+        print(f"⚠ Replay failed: {e}")
+        sys.exit(1)
+
+    print("\n" + "="*60)
+    print("📼 TRAFFIC REPLAY COMPLETE")
+    print("="*60)
+    print(f"Messages processed: {stats['written']}")
+    print(f"Malformed lines skipped: {stats['skipped']}")
+    print(f"Total time: {stats['elapsed_seconds']:.2f}s")
+    print(f"Throughput: {stats['messages_per_second']:.1f} messages/sec")
+    latency = stats['latency'].summary_ms()
+    if latency['count']:
+        print(f"Response time p50/p90/p99: {latency['p50_ms']:.3f}/{latency['p90_ms']:.3f}/"
+              f"{latency['p99_ms']:.3f}ms (max {latency['max_ms']:.3f}ms)")
+
+
+if __name__ == "__main__":
+    main()
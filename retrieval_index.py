@@ -0,0 +1,66 @@
+"""
+Nearest-Neighbour Retrieval over Training Utterances
+Top-k cosine lookup against a precomputed TF-IDF exemplar index
+
+Exemplars are vectorized once with the inference engine's TF-IDF (rows are
+L2-normalized, so a dot product is the cosine similarity) and stored
+transposed, features x exemplars. Scoring a batch of messages is then one
+sparse product, (messages x features) @ (features x exemplars), which only
+touches exemplars sharing at least one n-gram with a message; the cost grows
+with the number of overlapping exemplars rather than the size of the index.
+
+    index = RetrievalIndex(bot.inference_engine, texts, labels)
+    index.search(["my parcel is late"], k=3)
+    # [[Match(label='shipping', exemplar='...', score=0.61), ...]]
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+Match = namedtuple('Match', ['label', 'exemplar', 'score'])
+
+
+class RetrievalIndex:
+    def __init__(self, engine, texts, labels):
+        texts = list(texts)
+        labels = list(labels)
+        if len(texts) != len(labels):
+            raise ValueError(f"{len(texts)} exemplar texts but {len(labels)} labels")
+        self.engine = engine
+        self.texts = texts
+        self.labels = labels
+        self.n_features = len(engine.idf)
+        indptr, indices, data = engine.transform(texts)
+        exemplars = csr_matrix((data, indices, indptr), shape=(len(texts), self.n_features))
+        self.exemplars_t = exemplars.T.tocsr()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def similarities(self, messages):
+        """Cosine similarity of each message to every exemplar, as a sparse CSR matrix"""
+        indptr, indices, data = self.engine.transform(messages)
+        queries = csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, self.n_features))
+        return queries @ self.exemplars_t
+
+    def search(self, messages, k=1):
+        """Top-k Matches per message, best first; [] when no exemplar shares an n-gram"""
+        scores = self.similarities(messages)
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            row_scores = scores.data[start:end]
+            row_exemplars = scores.indices[start:end]
+            if len(row_scores) > k:
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                row_scores, row_exemplars = row_scores[top], row_exemplars[top]
+            # Highest score first; ties go to the earlier exemplar
+            order = np.lexsort((row_exemplars, -row_scores))
+            results.append([Match(self.labels[exemplar], self.texts[exemplar], float(score))
+                            for exemplar, score in zip(row_exemplars[order].tolist(),
+                                                       row_scores[order].tolist())
+                            if score > 0])
+        return results
@@ -3,7 +3,21 @@ Test Script for ML-Enhanced Chatbot
 Validates chatbot functionality and generates sample metrics
 """
 
-from chatbot import CustomerSupportBot
+from chatbot import TRAINING_DATA, ConversationState, CustomerSupportBot, RepeatDetector, SessionManager
+from chatbot_server import ChatServer
+from replay_traffic import replay
+from latency_histogram import LatencyHistogram
+from event_log import EventLog
+from metrics_store import MetricsStore
+from visualize_metrics import render_reports
+from instrumentation import CounterSink, Instrumentation, SamplingProfilerSink, TraceSink
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
 import time
 
 
@@ -121,34 +135,801 @@ def test_escalation_logic():
     print(f"  Response: {'ESCALATED' if 'human agent' in response.lower() else 'Normal'}")
 
 
+def test_batch_matches_single():
+    """Batch inference must give the same intents and responses as single calls"""
+    messages = [
+        "Hello", "Where is my order ORD12345?", "I want a refund",
+        "This product is broken", "blah blah", "Where is my order ORD12345?",
+        "Connect me to a human", "Thank you", "Bye",
+    ]
+    single_bot = CustomerSupportBot(use_ml=True)
+    batch_bot = CustomerSupportBot(use_ml=True)
+    
+    assert batch_bot.detect_intents(messages) == [single_bot.detect_intent(m) for m in messages]
+    
+    single_bot = CustomerSupportBot(use_ml=True)
+    expected = [single_bot.get_response(m) for m in messages]
+    assert batch_bot.get_responses(messages) == expected
+    assert batch_bot.detect_intents([]) == []
+
+
+def test_turn_analysis_computed_once():
+    """A logged turn counts its sentiment and frustration exactly once"""
+    bot = CustomerSupportBot(use_ml=True)
+    user_input = "This is terrible, awful and I hate it"
+    
+    analysis = bot.analyze_turn(user_input)
+    response = bot.get_response(user_input, analysis)
+    bot.log_conversation(analysis, response)
+    
+    assert sum(bot.metrics['sentiment_distribution'].values()) == 1
+    assert bot.user_frustration_level == 1
+    assert bot.conversation_history[-1]['intent'] == analysis.intent
+
+
+def test_session_manager_isolation():
+    """Sessions share one model but keep separate conversation state"""
+    manager = SessionManager(CustomerSupportBot(use_ml=True), max_sessions=2)
+    
+    manager.respond("alice", "Where is my order?")
+    response, analysis = manager.respond("alice", "Where is my order?")
+    assert "human agent" in response.lower()
+    
+    response, _ = manager.respond("bob", "Where is my order?")
+    assert "human agent" not in response.lower()
+    assert manager.get_state("alice").turn_count == 2
+    assert len(manager.get_state("alice").conversation_history) == 0   # no transcripts by default
+    
+    kept = SessionManager(manager.bot, history_limit=20)
+    kept.respond("dave", "Hello")
+    assert len(kept.get_state("dave").conversation_history) == 1
+    
+    # A third session pushes out the least recently used one
+    manager.respond("carol", "Hello")
+    assert len(manager) == 2 and "bob" not in manager.sessions
+    assert manager.evictions == 1
+
+
+def test_server_micro_batching(tmp_path):
+    """The asyncio server answers concurrent NDJSON requests in micro-batches"""
+    event_log = EventLog(str(tmp_path), flush_interval=60)
+    async def scenario():
+        server = ChatServer(SessionManager(CustomerSupportBot(use_ml=True, event_log=event_log)), max_batch_size=8)
+        tcp_server = await server.start(port=0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        
+        messages = ["Hello", "I want a refund", "Where is my order?", "Where is my order?"]
+        for i, text in enumerate(messages):
+            writer.write((json.dumps({'session_id': 's1', 'text': text, 'id': i}) + "\n").encode())
+        await writer.drain()
+        replies = [json.loads(await reader.readline()) for _ in messages]
+        
+        writer.write(b'{"op": "stats"}\n')
+        await writer.drain()
+        stats = json.loads(await reader.readline())
+        
+        # Ending waits for the session's pending replies; still-open sessions end at shutdown
+        writer.write(b'{"session_id": "s2", "text": "hello"}\n{"session_id": "s3", "text": "hi"}\n')
+        writer.write(b'{"op": "end", "session_id": "s1"}\n{"op": "end", "session_id": "nope"}\n')
+        await writer.drain()
+        ended = [json.loads(await reader.readline()) for _ in range(4)]
+        writer.close()
+        await server.close(tcp_server)
+        return replies, stats, ended
+    
+    replies, stats, ended = asyncio.run(scenario())
+    replies = sorted(replies, key=lambda r: r['id'])
+    assert [r['intent'] for r in replies[:2]] == ['greeting', 'refund']
+    assert replies[3]['escalated'] and not replies[2]['escalated']
+    assert stats['requests'] == 4 and stats['batches'] < 4
+    assert ended[2:] == [{'session_id': 's1', 'ended': True}, {'session_id': 'nope', 'ended': False}]
+    
+    event_log.close()
+    with open(event_log.files_written[0]) as f:
+        records = [json.loads(line) for line in f]
+    sessions = {r['session_id']: r['turns'] for r in records if r['type'] == 'session'}
+    assert sessions == {'s1': 4, 's2': 1, 's3': 1}
+
+    # A full queue stops the server reading, instead of queueing every message sent
+    async def flood():
+        server = ChatServer(SessionManager(CustomerSupportBot(use_ml=False)), max_batch_size=1, max_queue_size=2)
+        tcp_server = await server.start(port=0)
+        gate = threading.Event()
+        server.executor.submit(gate.wait)   # stall the worker thread
+        reader, writer = await asyncio.open_connection('127.0.0.1', tcp_server.sockets[0].getsockname()[1])
+        for i in range(50):
+            writer.write((json.dumps({'session_id': f"s{i}", 'text': "hello"}) + "\n").encode())
+        await writer.drain()
+        await asyncio.sleep(0.2)
+        in_flight = server.queue.qsize(), len(asyncio.all_tasks())
+        gate.set()
+        replies = [json.loads(await reader.readline()) for _ in range(50)]
+        writer.close()
+        await server.close(tcp_server)
+        return in_flight, replies
+
+    (queued, tasks), replies = asyncio.run(flood())
+    assert queued == 2 and tasks < 10
+    assert all(reply['intent'] == 'greeting' for reply in replies)
+
+
+def test_replay_preserves_session_order(tmp_path):
+    """Sharded replay answers every record and keeps each session's order"""
+    input_path = tmp_path / "traffic.jsonl"
+    output_path = tmp_path / "responses.jsonl"
+    texts = ["Hello", "Where is my order?", "Where is my order?", "Bye"]
+    with open(input_path, 'w') as f:
+        for text in texts:
+            for session in range(5):
+                f.write(json.dumps({'session_id': f"s{session}", 'text': text}) + "\n")
+        f.write("not json\n")
+    
+    stats = replay(str(input_path), str(output_path), workers=2, chunk_size=3)
+    
+    with open(output_path) as f:
+        records = [json.loads(line) for line in f]
+    assert stats['written'] == 20 and stats['skipped'] == 1
+    for session in range(5):
+        session_records = [r for r in records if r['session_id'] == f"s{session}"]
+        assert [r['text'] for r in session_records] == texts
+        assert [r['escalated'] for r in session_records] == [False, False, True, False]
+
+
+def test_replay_fails_fast_on_worker_errors(tmp_path, monkeypatch):
+    """A failing or dying worker aborts the replay with ReplayError instead of hanging"""
+    from replay_traffic import ReplayError
+    input_path = tmp_path / "traffic.jsonl"
+    with open(input_path, 'w') as f:
+        for i in range(2000):
+            f.write(json.dumps({'session_id': f"s{i % 7}", 'text': "Hello"}) + "\n")
+    
+    def fail(self, turns):
+        raise RuntimeError("model exploded")
+    
+    def die(self, turns):
+        os._exit(3)
+    
+    for respond_many, expected in ((fail, "model exploded"), (die, "exited with code 3")):
+        monkeypatch.setattr(SessionManager, 'respond_many', respond_many)
+        started = time.monotonic()
+        try:
+            replay(str(input_path), str(tmp_path / "out.jsonl"), workers=2, chunk_size=10, use_ml=False)
+            assert False, "replay must fail"
+        except ReplayError as e:
+            assert expected in str(e)
+        assert time.monotonic() - started < 30
+
+
+def test_keyword_matcher_priority():
+    """The compiled matcher keeps the original intent priority order"""
+    bot = CustomerSupportBot(use_ml=False)
+    
+    def legacy(user_input):
+        user_input = user_input.lower()
+        for intent, keywords in bot.patterns.items():
+            for keyword in keywords:
+                if keyword in user_input:
+                    return intent
+        return 'unknown'
+    
+    inputs = ["shipping cost", "Goodbye", "payment method", "delivery time please",
+              "I want my money back", "cancellation", "nothing here", "SPEAK TO HUMAN",
+              "broken item", "Thanks for the refund"]
+    for user_input in inputs:
+        assert bot._rule_based_intent(user_input) == legacy(user_input), user_input
+
+
+def test_batch_sentiment_matches_single():
+    """Vectorized lexicon scoring gives the same sentiments and frustration"""
+    messages = ["This is great! I love it!", "This is terrible and frustrating",
+                "no no no not good", "awful awful awful", "Excellent service, thank you!", ""]
+    single_bot = CustomerSupportBot(use_ml=False)
+    batch_bot = CustomerSupportBot(use_ml=False)
+    
+    expected = [single_bot.detect_sentiment(m) for m in messages]
+    assert batch_bot.detect_sentiments(messages) == expected
+    assert batch_bot.user_frustration_level == single_bot.user_frustration_level
+    assert batch_bot.metrics['sentiment_distribution'] == single_bot.metrics['sentiment_distribution']
+
+
+def test_order_id_precedence():
+    """The combined order-ID pattern keeps ORD, #, 'order N', 'id N' precedence"""
+    bot = CustomerSupportBot(use_ml=False)
+    cases = [
+        ("Where is my order ORD12345?", "ORD12345"),
+        ("order 55 and later #77", "#77"),
+        ("my id 9, see order 12", "order 12"),
+        ("customer id  42", "id  42"),
+        ("#1 then ord2", "ord2"),
+        ("no digits here", None),
+        ("paid 10 dollars", "id 10"),
+    ]
+    for user_input, expected in cases:
+        assert bot.extract_order_id(user_input) == expected, user_input
+    assert bot.extract_order_ids([c[0] for c in cases]) == [c[1] for c in cases]
+
+
+def test_intent_cache():
+    """Cached predictions match uncached ones and are dropped on model reload or a setting change"""
+    messages = ["Where is my order?", "where is my order? ", "Hi", "refund", "hi", "xyz"]
+    plain_bot = CustomerSupportBot(use_ml=True)
+    cached_bot = CustomerSupportBot(use_ml=True, intent_cache_size=3)
+    
+    assert cached_bot.classify_intents(messages) == plain_bot.classify_intents(messages)
+    stats = cached_bot.intent_cache.stats()
+    assert stats['hits'] == 0 and stats['misses'] == 6 and stats['size'] == 3
+    assert stats['evictions'] == 1
+    
+    assert cached_bot.detect_intent("HI") == plain_bot.detect_intent("HI")
+    assert cached_bot.intent_cache.hits == 1
+    
+    cached_bot.load_or_train_model()
+    assert len(cached_bot.intent_cache) == 0
+
+    # Cached entries carry threshold decisions, so changing a threshold drops them
+    assert cached_bot.detect_intent("xyz") == 'unknown'   # below the confidence threshold
+    cached_bot.confidence_threshold = 0.0
+    assert len(cached_bot.intent_cache) == 0
+    assert cached_bot.detect_intent("xyz") != 'unknown'
+    cached_bot.retrieval_min_score = 0.5
+    cached_bot.use_ml = False
+    assert len(cached_bot.intent_cache) == 0 and cached_bot.detect_intent("xyz") == 'unknown'
+
+
+def test_model_artifact_roundtrip(tmp_path, monkeypatch):
+    """The legacy pickle imports into a checksummed, memory-mapped artifact"""
+    from inference_engine import IntentInferenceEngine
+    from model_artifact import ModelArtifact, ModelArtifactError
+    from versioned_dir import current_version
+    import numpy as np
+    import pytest
+    
+    shutil.copy("chatbot_model.pkl", tmp_path / "chatbot_model.pkl")
+    monkeypatch.chdir(tmp_path)
+    legacy_bot = CustomerSupportBot(use_ml=True)
+    assert os.path.isdir("chatbot_model")
+    
+    artifact = ModelArtifact.load("chatbot_model")
+    assert isinstance(artifact.feature_log_prob, np.memmap)
+    # The engine scores from the mapped arrays as is, so workers keep sharing their pages
+    engine = IntentInferenceEngine.from_artifact(artifact)
+    assert np.shares_memory(engine.feature_log_prob_t, artifact.feature_log_prob_t)
+    assert np.shares_memory(engine.vocabulary, artifact.vocabulary)
+    bot = CustomerSupportBot(use_ml=True)
+    messages = ["hello there", "where is my order", "this is broken", "xyz"]
+    X_legacy = legacy_bot.vectorizer.transform(messages)
+    X = bot.vectorizer.transform(messages)
+    assert np.allclose(legacy_bot.intent_classifier.predict_proba(X_legacy),
+                       bot.intent_classifier.predict_proba(X))
+    
+    version = current_version("chatbot_model")
+    assert version != "chatbot_model" and os.path.exists(os.path.join("chatbot_model", "CURRENT"))
+    with open(os.path.join(version, "idf.npy"), "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\x00")
+    with pytest.raises(ModelArtifactError):
+        ModelArtifact.load("chatbot_model")
+    
+    # A missing array or a malformed manifest is an artifact error too, so the bot retrains
+    os.remove(os.path.join(version, "idf.npy"))
+    with pytest.raises(ModelArtifactError):
+        ModelArtifact.load("chatbot_model")
+    assert CustomerSupportBot(use_ml=True).inference_engine is not None
+    with open(os.path.join(current_version("chatbot_model"), "manifest.json"), "w") as f:
+        json.dump({"format_version": 1}, f)
+    with pytest.raises(ModelArtifactError):
+        ModelArtifact.load("chatbot_model")
+    
+    # Saves swap a pointer: readers racing a writer always load a complete artifact
+    artifact = ModelArtifact.load(os.path.join(os.path.dirname(__file__), "chatbot_model"))
+    errors = []
+    def read_loop():
+        for _ in range(50):
+            try:
+                ModelArtifact.load("chatbot_model")
+            except ModelArtifactError as e:
+                errors.append(e)
+    reader = threading.Thread(target=read_loop)
+    artifact.save("chatbot_model")
+    reader.start()
+    for _ in range(10):
+        artifact.save("chatbot_model")
+    reader.join()
+    assert errors == []
+    assert len([entry for entry in os.listdir("chatbot_model") if entry.startswith("v-")]) <= 2
+
+
+def test_inference_engine_matches_sklearn():
+    """The pure-NumPy engine reproduces TfidfVectorizer + MultinomialNB"""
+    import numpy as np
+    
+    bot = CustomerSupportBot(use_ml=True)
+    messages = ["Hello", "Where is my order ORD12345?", "I want a refund, refund NOW",
+                "this product is broken and damaged", "", "xyz qqq", "a",
+                "can you assist me with payment methods for my order"]
+    expected = bot.intent_classifier.predict_proba(bot.vectorizer.transform(messages))
+    
+    engine = bot.inference_engine
+    assert np.allclose(engine.predict_proba(messages), expected)
+    for message, row in zip(messages, expected):
+        assert np.allclose(engine.predict_proba([message])[0], row)
+    assert list(engine.predict(messages)) == list(bot.intent_classifier.predict(bot.vectorizer.transform(messages)))
+
+
+def test_rule_only_startup_skips_ml_imports():
+    """Importing the bot and answering in rule-only mode never loads the ML stack"""
+    probe = (
+        "import sys, chatbot\n"
+        "bot = chatbot.CustomerSupportBot(use_ml=False)\n"
+        "bot.get_response('Where is my order ORD1?')\n"
+        "print([m for m in ('numpy', 'scipy', 'sklearn', 'matplotlib') if m in sys.modules])\n"
+    )
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+def test_latency_histogram():
+    """Percentiles stay within bucket precision and histograms merge losslessly"""
+    samples = [1000 * (i + 1) for i in range(1000)]   # 1µs .. 1ms
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for i, sample in enumerate(samples):
+        (first if i % 2 else second).record(sample)
+    merged = LatencyHistogram.from_dict(json.loads(json.dumps(first.to_dict()))).merge(second)
+    
+    assert merged.count == 1000 and merged.max_ns == 1000000 and merged.min_ns == 1000
+    assert merged.mean_ns == sum(samples) / 1000
+    for percent, exact in ((50, 500000), (90, 900000), (99, 990000)):
+        assert abs(merged.percentile(percent) - exact) / exact < 0.05
+    assert len(merged.counts) == len(LatencyHistogram().counts)
+    
+    bot = CustomerSupportBot(use_ml=False)
+    for message in ["Hello", "Where is my order ORD123?", "thanks"]:
+        bot.get_response(message)
+    assert bot.metrics['response_latency'].count == 3
+    assert "p50/p90/p99" in bot.generate_metrics_report()
+
+    # Latency includes classification, also when the turn was analyzed first or
+    # classified in a batch (the batch cost is spread evenly over its turns)
+    def slow_classify(messages):
+        time.sleep(0.02)
+        return [('greeting', None)] * len(messages)
+
+    bot = CustomerSupportBot(use_ml=False)
+    bot.classify_intents = slow_classify
+    bot.get_response("Hello")
+    bot.get_response("Hello again", bot.analyze_turn("Hello again"))
+    assert bot.metrics['response_latency'].min_ns >= 20e6
+
+    manager = SessionManager(CustomerSupportBot(use_ml=False))
+    manager.bot.classify_intents = slow_classify
+    manager.respond_many([('a', "hi"), ('b', "hi"), ('a', "hey"), ('c', "hello")])
+    latency = manager.bot.metrics['response_latency']
+    assert latency.count == 4 and 5e6 <= latency.min_ns and latency.max_ns < 20e6
+
+
+def test_unknown_escalation_counters():
+    """Unclear-request escalation uses logged intents, within its own turn window"""
+    def chat(bot, text):
+        analysis = bot.analyze_turn(text)
+        response = bot.get_response(text, analysis)
+        bot.log_conversation(analysis, response)
+        return analysis
+    
+    bot = CustomerSupportBot(use_ml=False)
+    chat(bot, "hello, my tracking number is unknown")   # mentions 'unknown', is not one
+    chat(bot, "qqq one")
+    assert "Multiple unclear requests" not in chat(bot, "qqq two").escalation_reasons
+    assert "Multiple unclear requests" in chat(bot, "qqq three").escalation_reasons
+    
+    # With a bounded window, unclear turns that fell out of it no longer count
+    manager = SessionManager(CustomerSupportBot(use_ml=False), unclear_window_turns=3)
+    manager.respond('s', "qqq one")
+    manager.respond('s', "qqq two")
+    for text in ["hello", "thanks", "payment"]:
+        manager.respond('s', text)
+    _, analysis = manager.respond('s', "qqq three")
+    assert "Multiple unclear requests" not in analysis.escalation_reasons
+    _, analysis = manager.respond('s', "qqq four")
+    assert "Multiple unclear requests" not in analysis.escalation_reasons
+    _, analysis = manager.respond('s', "qqq five")
+    assert "Multiple unclear requests" in analysis.escalation_reasons
+    
+    # How much history is kept (e.g. capped by an event log) does not change the outcome
+    script = ["qqq one", "qqq two"] + ["hello"] * 25 + ["qqq three"]
+    outcomes = []
+    for history_limit in (None, 20, 3):
+        bot = CustomerSupportBot(use_ml=False)
+        bot.state = ConversationState(history_limit)
+        outcomes.append([chat(bot, text).escalation_reasons for text in script][-1])
+    assert outcomes[0] == outcomes[1] == outcomes[2] == ["Multiple unclear requests"]
+
+
+def test_repeat_detector_window():
+    """Repeats count only within the turn and time window, in constant memory"""
+    detector = RepeatDetector(window_turns=3, window_seconds=60)
+    assert detector.observe("Where is my order?", now=0) == 1
+    assert detector.observe("where is my ORDER?", now=1) == 2
+    assert detector.observe("Where is my order?", now=100) == 1   # earlier asks too old
+    for i in range(3):
+        detector.observe(f"other question {i}", now=101)
+    assert detector.observe("Where is my order?", now=102) == 1   # pushed out of the ring
+    assert len(detector) == 3
+    
+    bot = CustomerSupportBot(use_ml=False)
+    for i in range(1000):
+        bot.get_response(f"question number {i}")
+    assert len(bot.repeated_questions) == 10
+
+
+def test_event_log_streams_turns(tmp_path):
+    """Turns and session summaries are appended as JSONL, flushed in the background"""
+    event_log = EventLog(str(tmp_path), flush_size=4, flush_interval=60, max_bytes=600)
+    bot = CustomerSupportBot(use_ml=False, event_log=event_log)
+    manager = SessionManager(bot)
+    for i in range(30):
+        manager.respond('alice', f"Where is my order ORD{i}?")
+    manager.respond('bob', "hello")
+    manager.end_session('alice')
+    
+    deadline = time.time() + 5
+    while event_log.records_written < 28 and time.time() < deadline:
+        time.sleep(0.01)
+    assert event_log.records_written >= 28   # size-triggered flushes, no close needed
+    event_log.close()
+    
+    records = []
+    for path in event_log.files_written:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f)
+    assert len(event_log.files_written) > 1   # rotated by size
+    turns = [r for r in records if r['type'] == 'turn' and r['session_id'] == 'alice']
+    assert [r['turn'] for r in turns] == list(range(1, 31))
+    sessions = [r for r in records if r['type'] == 'session']
+    assert sessions == [dict(sessions[0], session_id='alice', turns=30)]
+    assert len(manager.get_state('alice').conversation_history) == 0
+    assert len(bot.conversation_history) == 0 and bot.conversation_history.maxlen == 20
+    
+    # A failing background flush is reported and dropped; the writer keeps draining
+    event_log = EventLog(str(tmp_path / 'failing'), flush_size=2, flush_interval=60)
+    circular = {'type': 'bad'}
+    circular['self'] = circular
+    event_log.write(circular)
+    event_log.write({'type': 'turn'})
+    deadline = time.time() + 5
+    while event_log.records_dropped < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    event_log.write({'type': 'turn'})
+    event_log.write({'type': 'turn'})
+    while event_log.records_written < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    event_log.close()
+    assert (event_log.records_dropped, event_log.records_written, event_log.flush_errors) == (2, 2, 1)
+
+
+def test_metrics_store_incremental(tmp_path):
+    """Metrics files are ingested once; daily and intent trends aggregate them"""
+    def write_session(name, start, interactions, escalations, latency_ms, intents):
+        metrics = {
+            'total_interactions': interactions, 'escalations_to_human': escalations,
+            'escalation_rate': escalations / interactions, 'average_response_time_ms': latency_ms,
+            'intents_detected': intents, 'sentiment_distribution': {'neutral': interactions},
+            'satisfaction_scores': [4], 'average_satisfaction': 4.0,
+        }
+        path = tmp_path / name
+        path.write_text(json.dumps({'session_info': {'start_time': start}, 'metrics': metrics}))
+        return str(path)
+    
+    files = [
+        write_session('a.json', '2026-01-14T09:00:00', 10, 1, 2.0, {'greeting': 4, 'refund': 6}),
+        write_session('b.json', '2026-01-14T17:00:00', 30, 6, 1.0, {'refund': 30}),
+        write_session('c.json', '2026-01-15T09:00:00', 5, 0, 4.0, {'unknown': 5}),
+    ]
+    store = MetricsStore(str(tmp_path / 'store'))
+    assert store.ingest(files) == 3
+    store.save()
+    
+    reopened = MetricsStore(str(tmp_path / 'store'))
+    assert reopened.ingest(files) == 0   # nothing new to parse
+    trends = reopened.daily_trends()
+    assert [str(day) for day in trends['days']] == ['2026-01-14', '2026-01-15']
+    assert list(trends['interactions']) == [40, 5]
+    assert abs(trends['escalation_rate'][0] - 7 / 40) < 1e-12
+    assert abs(trends['average_response_time_ms'][0] - 50 / 40) < 1e-12
+    days, intents, counts = reopened.intent_trends()
+    assert dict(zip(intents, counts[0])) == {'greeting': 4, 'refund': 36, 'unknown': 0}
+    
+    time.sleep(0.01)
+    write_session('a.json', '2026-01-14T09:00:00', 10, 1, 2.0, {'greeting': 10})
+    assert reopened.ingest(files) == 1   # re-written file replaces its row
+    days, intents, counts = reopened.intent_trends()
+    assert len(reopened) == 3 and dict(zip(intents, counts[0])) == {'greeting': 10, 'refund': 30, 'unknown': 0}
+    assert reopened.summary()['total_interactions'] == 45
+    
+    os.remove(files[1])
+    assert reopened.ingest(files) == 0   # deleted file's row is dropped
+    reopened.save()
+    reopened = MetricsStore(str(tmp_path / 'store'))
+    days, intents, counts = reopened.intent_trends()
+    assert len(reopened) == 2 and dict(zip(intents, counts[0])) == {'greeting': 10, 'refund': 0, 'unknown': 0}
+    assert os.path.exists(tmp_path / 'store' / 'CURRENT')
+    
+    # Rendering helpers import the store (and NumPy) only when they need it
+    code = "import sys, visualize_metrics; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.strip() == "False"
+
+
+def test_batch_report_rendering(tmp_path):
+    """Reports render headlessly in parallel and up-to-date ones are skipped"""
+    inputs = []
+    for i in range(2):
+        path = tmp_path / f"chatbot_metrics_2026011{i}_120000.json"
+        shutil.copy('chatbot_metrics_20260114_233358.json', path)
+        inputs.append(str(path))
+    output_dir = str(tmp_path / 'reports')
+    
+    rendered, skipped = render_reports(inputs, output_dir, fmt='svg', dpi=50, workers=2)
+    assert skipped == 0 and sorted(os.listdir(output_dir)) == [
+        'chatbot_metrics_20260110_120000_analysis.svg', 'chatbot_metrics_20260111_120000_analysis.svg']
+    
+    rendered, skipped = render_reports(inputs, output_dir, fmt='svg', dpi=50, workers=2)
+    assert rendered == [] and skipped == 2
+
+    # Only the render workers switch to Agg; the caller keeps its backend, even for one report
+    import matplotlib
+    backend = matplotlib.get_backend()
+    matplotlib.use('svg')
+    try:
+        rendered, _ = render_reports(inputs[:1], output_dir, fmt='svg', dpi=50, workers=1, force=True)
+        assert len(rendered) == 1 and matplotlib.get_backend() == 'svg'
+    finally:
+        matplotlib.use(backend)
+
+
+def test_instrumentation_sinks(tmp_path):
+    """Stage spans and fallback events reach every attached sink"""
+    counters = CounterSink()
+    profiler = SamplingProfilerSink(str(tmp_path / 'profiles'), every=2)
+    event_log = EventLog(str(tmp_path / 'trace'), flush_interval=60)
+    instrumentation = Instrumentation([counters, profiler, TraceSink(event_log)])
+    bot = CustomerSupportBot(use_ml=True, instrumentation=instrumentation)
+    plain_bot = CustomerSupportBot(use_ml=True, instrumentation=Instrumentation())   # no sinks
+    
+    messages = ["Hello", "Where is my order ORD12345?", "xyz qqq", "I want a refund"]
+    assert [bot.get_response(m) for m in messages] == [plain_bot.get_response(m) for m in messages]
+    
+    snapshot = counters.snapshot()
+    for stage in ('get_response', 'detect_intent', 'detect_sentiment', 'should_escalate_to_human',
+                  'generate_response'):
+        assert snapshot['spans'][stage]['count'] == 4, stage
+    assert snapshot['events']['intent'] == 4
+    assert snapshot['events']['fallback:low_confidence'] >= 1   # "xyz qqq" scores below the threshold
+    assert len(profiler.profiles_written) == 2 and all(os.path.exists(p) for p in profiler.profiles_written)
+    
+    event_log.close()
+    with open(event_log.files_written[0]) as f:
+        records = [json.loads(line) for line in f]
+    assert sum(r['type'] == 'span' and r['stage'] == 'get_response' for r in records) == 4
+    assert any(r['type'] == 'event' and r['event'] == 'fallback' for r in records)
+
+
+def test_online_learning_corrections():
+    """Corrections are learned in batches and take effect without retraining"""
+    bot = CustomerSupportBot(use_ml=True, intent_cache_size=16)
+    bot.enable_online_learning(batch_size=3)
+    message = "parcel vanished somewhere"
+    assert bot.detect_intent(message) != 'complaint'
+    
+    bot.conversation_history.append({'user': message, 'corrected_intent': 'complaint'})
+    bot.conversation_history.append({'user': "hello", 'intent': 'greeting'})
+    bot.learn_from_history()
+    assert not bot.record_correction(message, 'complaint')   # 2 of 3 queued
+    assert bot.detect_intent(message) != 'complaint'
+    assert bot.record_correction("my parcel vanished", 'complaint')   # batch applied
+    
+    assert bot.online_model.updates == 2   # seed training + one correction batch
+    assert bot.detect_intent(message) == 'complaint'   # cached answer was invalidated
+    try:
+        bot.record_correction(message, 'not_an_intent')
+        assert False, "unknown labels must be rejected"
+    except ValueError:
+        pass
+
+    # A model trained on other data is only replaced by one seeded from that data
+    from model_artifact import ModelArtifact
+    corpus_bot = CustomerSupportBot(use_ml=True)
+    artifact = corpus_bot._model_artifact
+    params = dict(artifact.params, training={'source': 'corpus.jsonl'})
+    corpus_bot._set_model(ModelArtifact(artifact.vocabulary, artifact.idf, artifact.classes,
+                                        artifact.class_log_prior, artifact.feature_log_prob, params))
+    for enable in (corpus_bot.enable_online_learning, CustomerSupportBot(use_ml=False).enable_online_learning):
+        try:
+            enable()
+            assert False, "online learning must not replace a model it cannot seed"
+        except RuntimeError:
+            pass
+    corpus_bot.enable_online_learning(examples=iter(TRAINING_DATA + [(message, 'complaint')] * 5))
+    assert corpus_bot.online_model.samples_seen == len(TRAINING_DATA) + 5
+    assert corpus_bot.detect_intent(message) == 'complaint'
+    corpus_bot.use_ml = False
+    assert corpus_bot.detect_intent(message) == 'unknown'   # the rules, not the online model
+
+
+def test_retrieval_fallback():
+    """Low-confidence turns resolve to near-duplicate exemplars, and to the nearest one when no rule fires"""
+    import numpy as np
+    from retrieval_index import RetrievalIndex
+    counters = CounterSink()
+    bot = CustomerSupportBot(use_ml=True, instrumentation=Instrumentation([counters]), retrieval_fallback=True)
+    assert len(bot.retrieval_index) == len(TRAINING_DATA)
+    bot.confidence_threshold = 1.01   # send every message through the fallback
+
+    assert bot.detect_intent("cancel my order") == 'cancel'         # exact exemplar beats the 'order' rule
+    assert bot.detect_intent("very disappointed") == 'complaint'    # no rule fires
+    assert bot.detect_intent("any news on my order") == 'order_status'  # weak match: rules answer
+    assert bot.detect_intent("xyz qqq") == 'unknown'                # nothing to retrieve
+    assert counters.snapshot()['events']['fallback:retrieval'] == 2
+    best = bot.retrieve(["cancel my order"])[0][0]
+    assert (best.label, best.exemplar) == ('cancel', "cancel my order") and abs(best.score - 1) < 1e-9
+
+    texts = [text for text, _ in TRAINING_DATA]
+    index = RetrievalIndex(bot.inference_engine, texts, [intent for _, intent in TRAINING_DATA])
+    queries = ["my package never came", "refund for a damaged item please", "hello", "xyz qqq"]
+    def dense(rows):
+        indptr, indices, data = bot.inference_engine.transform(rows)
+        matrix = np.zeros((len(rows), len(bot.inference_engine.idf)))
+        matrix[np.repeat(np.arange(len(rows)), np.diff(indptr)), indices] = data
+        return matrix
+    expected = dense(queries) @ dense(texts).T
+    for row, matches in zip(expected, index.search(queries, k=3)):
+        assert [m.score for m in matches] == sorted(row[row > 0], reverse=True)[:3]
+
+
+def test_typo_tolerance():
+    """Misspelled lexicon words and keywords are corrected only when the index is enabled"""
+    import pytest
+    from typo_index import TypoIndex
+    wordfreq = pytest.importorskip('wordfreq')   # optional dependency of typo tolerance
+    plain = CustomerSupportBot(use_ml=False)
+    bot = CustomerSupportBot(use_ml=False, typo_tolerance=True)
+    assert wordfreq.get_frequency_list.cache_info().currsize   # wordfreq's own cache is left alone
+    assert plain.detect_sentiment("this is frustating") == 'neutral'
+    assert plain.detect_sentiment("this is frustrating") == 'neutral'   # default lexicon unchanged
+    assert bot.detect_sentiment("this is frustating") == 'negative'
+    assert bot.detect_sentiments(["this is frustating", "terible servise"]) == ['negative', 'negative']
+    assert plain._rule_based_intent("i want a refnd") == 'unknown'
+    assert bot._rule_based_intent("i want a refnd") == 'refund'
+    assert bot._rule_based_intent("my pakage is damagd") == 'complaint'
+    
+    # Real words are never corrected, and keywords only match whole tokens
+    for message in ("I was shopping for a gift", "my broker sent it", "it does not exist",
+                    "I want to change my address", "this is frustating"):
+        assert bot._rule_based_intent(message) == 'unknown', message
+    assert plain._rule_based_intent("this is frustating") == 'greeting'   # 'hi' inside 'this'
+    assert [bot._rule_based_intent(m) for m in ("thanks a lot", "where is my order", "I want a reimbursement")] \
+        == ['thanks', 'order_status', 'refund']
+    assert not {'is', 'my', 'can', 'quit', 'exit', 'reimburs'} & bot.typo_index.words
+
+    index = TypoIndex(['terrible', 'refund', 'bands', 'bends'], known_words=['refunds'],
+                      aliases={'frustrating': 'frustrated'})
+    assert index.correct('frustating') == 'frustrated'      # deletion, reported as its alias
+    assert index.correct('terrilbe') == 'terrible'          # transposition
+    assert index.correct('refunds') is None                 # known word
+    assert index.correct('refnd') == 'refund'
+    assert index.correct('bonds') is None                   # ambiguous: bands or bends
+    assert index.correct('terbile') is None                 # beyond max_distance
+    assert index.correct('refnd') == 'refund' and index.correct.cache_info().hits >= 1
+    assert index.correct_tokens("I want a refnd!") == ['i', 'want', 'a', 'refund']
+
+
+def test_corpus_training_matches_in_memory(tmp_path):
+    """Chunked, parallel corpus training reproduces the in-memory TF-IDF + NB model"""
+    import csv
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+    from model_artifact import ModelArtifact
+    from train_corpus import train_corpus
+    
+    jsonl_path = tmp_path / 'corpus.jsonl'
+    with open(jsonl_path, 'w') as f:
+        for text, intent in TRAINING_DATA:
+            f.write(json.dumps({'text': text, 'intent': intent}) + "\n")
+        f.write("not json\n")
+    csv_path = tmp_path / 'corpus.csv'
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['message', 'label'])
+        writer.writerows(TRAINING_DATA)
+    
+    vectorizer = TfidfVectorizer(max_features=500, ngram_range=(1, 2))
+    classifier = MultinomialNB()
+    classifier.fit(vectorizer.fit_transform([t for t, _ in TRAINING_DATA]), [i for _, i in TRAINING_DATA])
+    expected = ModelArtifact.from_sklearn(vectorizer, classifier)
+    
+    for path, fields in ((jsonl_path, {}), (csv_path, {'text_field': 'message', 'label_field': 'label'})):
+        output = str(tmp_path / f"model_{path.suffix[1:]}")
+        stats = train_corpus(str(path), output, workers=2, chunk_size=7, **fields)
+        assert stats['rows'] == len(TRAINING_DATA) and stats['rows_per_second'] > 0
+        artifact = ModelArtifact.load(output)
+        assert list(artifact.vocabulary) == list(expected.vocabulary)
+        for name in ('idf', 'class_log_prior', 'feature_log_prob'):
+            assert np.allclose(getattr(artifact, name), getattr(expected, name)), name
+        assert stats['candidate_error'] == 0   # nothing pruned, so the counts are exact
+    
+    # With few candidates pass 1 prunes rare n-grams but still fills the vocabulary
+    stats = train_corpus(str(jsonl_path), str(tmp_path / 'pruned'), workers=2, chunk_size=7,
+                         max_features=20, max_candidates=40)
+    assert stats['candidate_error'] > 0 and stats['features'] == 20
+    document_frequency = (vectorizer.transform([t for t, _ in TRAINING_DATA]) > 0).sum(axis=0).A1
+    terms = vectorizer.get_feature_names_out()
+    assert set(terms[np.argsort(-document_frequency)[:5]]) <= set(ModelArtifact.load(str(tmp_path / 'pruned')).vocabulary)
+
+
+def test_evaluation_sweep_uses_fold_cache(tmp_path):
+    """The sweep scores every setting, and a repeat run reuses the cached folds"""
+    from evaluate_models import SENTIMENT_EXAMPLES, evaluate_sentiment, run_sweep
+    cache_dir = str(tmp_path / 'cache')
+    grid = dict(max_features=(250,), ngram_ranges=((1, 1), (1, 2)), alphas=(0.5, 1.0),
+                thresholds=(0.0, 0.4), folds=3, workers=2, cache_dir=cache_dir)
+
+    results = run_sweep(TRAINING_DATA, **grid)
+    assert len(results) == 8
+    assert results[0]['macro_f1'] == max(r['macro_f1'] for r in results)
+    for r in results:
+        assert 0 < r['accuracy'] <= 1 and r['latency_us'] > 0
+        assert set(r['per_class']) == {intent for _, intent in TRAINING_DATA}
+        assert r['cached_folds'] == 0
+
+    cached = sorted(os.path.join(root, name) for root, _, names in os.walk(cache_dir) for name in names)
+    assert len(cached) == 2 * 3
+    modified = [os.stat(path).st_mtime_ns for path in cached]
+    repeat = run_sweep(TRAINING_DATA, **grid)
+    assert [os.stat(path).st_mtime_ns for path in cached] == modified
+    strip = lambda rs: sorted((r['max_features'], r['ngram_range'], r['alpha'], r['threshold'], r['macro_f1'])
+                              for r in rs)
+    assert strip(repeat) == strip(results)
+    assert all(r['cached_folds'] == 3 for r in repeat)
+
+    # The held-out sentiment set is scored honestly: check the report, not a target accuracy
+    sentiment = evaluate_sentiment()
+    assert set(sentiment['per_class']) == {'negative', 'neutral', 'positive'}
+    assert sum(c['support'] for c in sentiment['per_class'].values()) == len(SENTIMENT_EXAMPLES)
+    correct = sum(c['recall'] * c['support'] for c in sentiment['per_class'].values())
+    assert abs(sentiment['accuracy'] - correct / len(SENTIMENT_EXAMPLES)) < 1e-9
+    assert 0 <= sentiment['macro_f1'] <= 1 and sentiment['latency_us'] > 0
+
+
+def test_benchmark_suite_regression_gate():
+    """The stage suite reports every stage and flags only real slowdowns"""
+    from benchmarks import _conversation_messages, _fresh_conversation, compare_to_baseline, run_suite
+    # end_to_end batches are distinct messages that leave a fresh conversation unescalated
+    bot = CustomerSupportBot(use_ml=True)
+    conversation = _conversation_messages(bot, 128)
+    assert len(set(conversation)) == 128
+    _fresh_conversation(bot).get_responses(conversation)
+    assert bot.metrics['escalations_to_human'] == 0
+    
+    results = run_suite(use_ml=True, batch_sizes=(1, 4), conversation_lengths=(1, 50), warmup=1, repeat=2)
+    assert {'vectorize[batch=4]', 'classify[batch=4]', 'rule_fallback[batch=1]', 'sentiment[batch=4]',
+            'end_to_end[batch=4]', 'response_rendering', 'escalation[turns=50]'} <= set(results)
+    
+    assert compare_to_baseline(results, results) == []
+    faster_baseline = {stage: dict(timing, best_us=timing['best_us'] / 2) for stage, timing in results.items()}
+    assert len(compare_to_baseline(results, faster_baseline, threshold=0.3)) == len(results)
+
+
 def performance_benchmark():
-    """Benchmark response time"""
+    """Benchmark response time, stage by stage (full suite: python benchmarks.py suite)"""
+    from benchmarks import print_suite, run_suite
+    
     print("\n" + "="*60)
     print("⚡ PERFORMANCE BENCHMARK")
     print("="*60 + "\n")
     
-    bot = CustomerSupportBot(use_ml=True)
-    
-    test_inputs = [
-        "Hello",
-        "Where is my order?",
-        "I need a refund for ORD12345",
-        "This is broken and not working",
-        "Thank you for your help"
-    ] * 20  # 100 total queries
-    
-    start_time = time.time()
-    for inp in test_inputs:
-        bot.get_response(inp)
-    end_time = time.time()
-    
-    total_time = end_time - start_time
-    avg_time = (total_time / len(test_inputs)) * 1000
-    
-    print(f"Total queries: {len(test_inputs)}")
-    print(f"Total time: {total_time:.2f}s")
-    print(f"Average response time: {avg_time:.2f}ms")
-    print(f"Queries per second: {len(test_inputs)/total_time:.1f}")
+    print_suite(run_suite(use_ml=True, repeat=3))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+"""
+Out-of-Core Training for the Intent Classifier
+Streams a labelled JSONL/CSV corpus in chunks and writes the model artifact
+
+Usage:
+    python train_corpus.py transcripts.jsonl --workers 8 --chunk-size 20000
+    python train_corpus.py transcripts.csv --text-field message --label-field intent
+
+The corpus is read twice, a chunk at a time, with a bounded number of chunks
+in flight across a process pool:
+    pass 1  term and document frequencies per chunk -> vocabulary and idf
+    pass 2  TF-IDF rows per chunk (the inference engine's own vectorizer),
+            summed per intent -> MultinomialNB counts
+Summing per-class feature counts is exactly the accumulation
+MultinomialNB.partial_fit performs, so the chunks can be processed in any
+order on any core. The result is the same ModelArtifact that
+load_or_train_model() loads, and matches TfidfVectorizer + MultinomialNB
+trained in memory (up to tie-breaking among equally frequent terms when the
+vocabulary is cut to max_features).
+
+Memory: the merged pass-1 tables keep at most 2 * max_candidates n-grams
+(default CANDIDATE_FACTOR * max_features) plus the n-grams of the chunk being
+merged. Whenever they outgrow that, only the max_candidates most frequent
+n-grams are kept. Each worker holds one chunk and its n-gram counts, and at
+most 2 * workers chunk results are in flight, so peak memory depends on
+max_features, chunk_size and workers, not on the corpus or its vocabulary.
+Pruning makes counts approximate: a pruned n-gram that recurs starts again
+from zero. The stats report candidate_error, the sum of the largest counts
+dropped by each pruning, which bounds how far any count can be low; 0 means
+nothing was pruned and the vocabulary and idf are exact. Pass
+max_features=None to keep every n-gram, which is exact but grows with the
+vocabulary.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import resource
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from chatbot import MODEL_ARTIFACT_DIR
+from inference_engine import IntentInferenceEngine
+from model_artifact import ModelArtifact
+
+
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+# Pass 1 keeps this many candidate n-grams per vocabulary slot (max_features)
+CANDIDATE_FACTOR = 20
+
+
+def iter_chunks(path, chunk_size=10000, text_field='text', label_field='intent'):
+    """Yield lists of (text, label) pairs from a JSONL or CSV file; bad rows are skipped"""
+    chunk = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        is_csv = path.endswith('.csv')
+        for row in (csv.DictReader(f) if is_csv else f):
+            if not is_csv:
+                try:
+                    row = json.loads(row)
+                except ValueError:
+                    continue
+            if not isinstance(row, dict):
+                continue
+            text, label = row.get(text_field), row.get(label_field)
+            if not text or not label:
+                continue
+            chunk.append((str(text), str(label)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _engine(vocabulary, idf, ngram_range):
+    """Inference engine used only for its tokenizer/vectorizer (no class arrays)"""
+    return IntentInferenceEngine(
+        vocabulary, idf, classes=np.zeros(0, dtype=str), class_log_prior=np.zeros(0),
+        feature_log_prob_t=np.zeros((len(idf), 0)), ngram_range=ngram_range,
+        token_pattern=TOKEN_PATTERN,
+    )
+
+
+_worker = {}
+
+
+def _init_worker(vocabulary, idf, classes, ngram_range):
+    _worker['engine'] = _engine(vocabulary, idf, ngram_range)
+    _worker['class_index'] = {label: i for i, label in enumerate(classes)}
+
+
+def _count_chunk(chunk, ngram_range):
+    """Pass 1: (term counts, document frequencies, label counts) for one chunk"""
+    engine = _engine(np.zeros(0, dtype=str), [], ngram_range)
+    term_counts, document_counts = Counter(), Counter()
+    for text, _ in chunk:
+        terms = engine.analyze(text)
+        term_counts.update(terms)
+        document_counts.update(set(terms))
+    return term_counts, document_counts, Counter(label for _, label in chunk), len(chunk)
+
+
+def _prune(term_counts, document_counts, capacity):
+    """Keep the capacity most frequent terms once there are twice that many.
+
+    Returns (term_counts, document_counts, largest term count dropped).
+    """
+    if capacity is None or len(term_counts) <= 2 * capacity:
+        return term_counts, document_counts, 0
+    kept = term_counts.most_common(capacity + 1)
+    dropped = kept.pop()[1]
+    return (Counter(dict(kept)), Counter({term: document_counts[term] for term, _ in kept}), dropped)
+
+
+def _class_feature_sums(chunk):
+    """Pass 2: per-class sums of the chunk's TF-IDF rows"""
+    engine, class_index = _worker['engine'], _worker['class_index']
+    indptr, indices, data = engine.transform([text for text, _ in chunk])
+    rows = np.repeat([class_index[label] for _, label in chunk], np.diff(indptr))
+    sums = np.zeros((len(class_index), len(engine.idf)))
+    np.add.at(sums, (rows, indices), data)
+    return sums
+
+
+def _bounded_map(executor, func, chunks, max_pending, *args):
+    """Yield func(chunk, *args) results (in completion order), keeping few chunks in memory"""
+    pending = set()
+    for chunk in chunks:
+        pending.add(executor.submit(func, chunk, *args))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in pending:
+        yield future.result()
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process and its largest worker, in MB (Linux reports KB)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, workers / 1024
+
+
+def train_corpus(path, output=MODEL_ARTIFACT_DIR, workers=None, chunk_size=10000, max_features=500,
+                 ngram_range=(1, 2), alpha=1.0, text_field='text', label_field='intent', max_candidates=None):
+    """Train TF-IDF + MultinomialNB on a corpus file and save the artifact; returns stats"""
+    workers = workers or os.cpu_count() or 1
+    if max_candidates is None and max_features is not None:
+        max_candidates = CANDIDATE_FACTOR * max_features
+    max_pending = 2 * workers
+    start_time = time.perf_counter()
+
+    def chunks():
+        return iter_chunks(path, chunk_size, text_field, label_field)
+
+    # Pass 1: vocabulary and document frequencies, pruned to the frequent candidates
+    term_counts, document_counts, label_counts = Counter(), Counter(), Counter()
+    rows = candidate_error = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for terms, documents, labels, count in _bounded_map(executor, _count_chunk, chunks(),
+                                                            max_pending, ngram_range):
+            term_counts.update(terms)
+            document_counts.update(documents)
+            label_counts.update(labels)
+            rows += count
+            term_counts, document_counts, dropped = _prune(term_counts, document_counts, max_candidates)
+            candidate_error += dropped
+    if not rows:
+        raise ValueError(f"no labelled rows found in {path}")
+
+    terms = sorted(term_counts)
+    if max_features is not None and len(terms) > max_features:
+        # Most frequent terms across the corpus, as TfidfVectorizer's max_features
+        terms = sorted(sorted(terms, key=lambda term: -term_counts[term])[:max_features])
+    vocabulary = np.array(terms, dtype=str)
+    document_frequency = np.array([document_counts[term] for term in terms], dtype=np.float64)
+    idf = np.log((1 + rows) / (1 + document_frequency)) + 1
+    classes = sorted(label_counts)
+    del term_counts, document_counts
+
+    # Pass 2: per-class TF-IDF sums
+    feature_count = np.zeros((len(classes), len(terms)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(vocabulary, idf, classes, ngram_range)) as executor:
+        for sums in _bounded_map(executor, _class_feature_sums, chunks(), max_pending):
+            feature_count += sums
+
+    class_count = np.array([label_counts[label] for label in classes], dtype=np.float64)
+    smoothed = feature_count + alpha
+    feature_log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+    class_log_prior = np.log(class_count) - math.log(class_count.sum())
+
+    artifact = ModelArtifact(
+        vocabulary=vocabulary,
+        idf=idf,
+        classes=np.array(classes, dtype=str),
+        class_log_prior=class_log_prior,
+        feature_log_prob=feature_log_prob,
+        params={
+            'vectorizer': {
+                'lowercase': True,
+                'token_pattern': TOKEN_PATTERN,
+                'ngram_range': list(ngram_range),
+                'max_features': max_features,
+                'norm': 'l2',
+                'smooth_idf': True,
+                'sublinear_tf': False,
+            },
+            'classifier': {'alpha': float(alpha), 'fit_prior': True},
+            'training': {'source': path, 'rows': rows},
+        },
+    )
+    artifact.save(output)
+
+    elapsed = time.perf_counter() - start_time
+    main_rss, worker_rss = _peak_rss_mb()
+    return {
+        'rows': rows,
+        'features': len(terms),
+        'classes': classes,
+        'candidate_error': candidate_error,
+        'elapsed_seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': main_rss,
+        'peak_worker_rss_mb': worker_rss,
+        'output': output,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the intent model on a large labelled corpus")
+    parser.add_argument('corpus', help="JSONL or .csv file of labelled utterances")
+    parser.add_argument('--output', default=MODEL_ARTIFACT_DIR, help="artifact directory to write")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="rows per chunk")
+    parser.add_argument('--max-features', type=int, default=500, help="vocabulary size (most frequent n-grams)")
+    parser.add_argument('--max-candidates', type=int, default=None,
+                        help=f"n-grams counted in pass 1 (default: {CANDIDATE_FACTOR} x max features)")
+    parser.add_argument('--ngram-max', type=int, default=2, help="longest word n-gram")
+    parser.add_argument('--alpha', type=float, default=1.0, help="Naive Bayes smoothing")
+    parser.add_argument('--text-field', default='text')
+    parser.add_argument('--label-field', default='intent')
+    args = parser.parse_args()
+
+    stats = train_corpus(args.corpus, args.output, args.workers, args.chunk_size, args.max_features,
+                         (1, args.ngram_max), args.alpha, args.text_field, args.label_field,
+                         args.max_candidates)
+
+    print("\n" + "="*60)
+    print("🏋️ CORPUS TRAINING COMPLETE")
+    print("="*60)
+    print(f"Rows trained: {stats['rows']:,}")
+    print(f"Vocabulary: {stats['features']} n-grams, {len(stats['classes'])} intents")
+    if stats['candidate_error']:
+        print(f"⚠ Rare n-grams were pruned in pass 1; counts may be low by up to {stats['candidate_error']}")
+    print(f"Total time: {stats['elapsed_seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/sec)")
+    print(f"Peak memory: {stats['peak_rss_mb']:.0f} MB main, {stats['peak_worker_rss_mb']:.0f} MB largest worker")
+    print(f"✓ Model artifact saved to {stats['output']}")
+
+
+if __name__ == "__main__":
+    main()
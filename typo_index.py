@@ -0,0 +1,110 @@
+"""
+Typo-Tolerant Word Lookup
+Symmetric-delete (SymSpell-style) index mapping misspelled tokens to known words
+
+Every word is indexed under each string obtained by deleting up to
+max_distance of its characters. A token is looked up by generating its own
+deletes and collecting the words that share one, so a lookup costs a few
+dictionary probes (len(token) + 1 for distance 1) regardless of vocabulary
+size. Candidates are verified with the optimal-string-alignment distance
+(insertions, deletions, substitutions and adjacent transpositions).
+
+Only tokens that are not real words are corrected: pass a dictionary of
+known words (e.g. common English words), so "broker" or "shopping" are never
+rewritten into a nearby keyword.
+
+    index = TypoIndex(['refund'], known_words=['refunds'], aliases={'frustrating': 'frustrated'})
+    index.correct('frustating')    # 'frustrated'
+    index.correct_tokens('i want a refnd')    # ['i', 'want', 'a', 'refund']
+"""
+
+import re
+from functools import lru_cache
+
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def _deletes(word, max_distance):
+    """word and every string made by deleting up to max_distance characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A shared prefix and suffix never change the distance; only the middle is aligned
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class TypoIndex:
+    """Map misspelled tokens to the indexed words within a bounded edit distance.
+
+    Tokens shorter than min_length and tokens in known_words (real words that
+    must not be "corrected") are never corrected. A token equally close to two
+    different words is left alone. aliases are extra spellings that are
+    indexed too but report the word they map to.
+    """
+
+    def __init__(self, words, max_distance=1, min_length=5, known_words=(), aliases=None, cache_size=4096):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.aliases = dict(aliases or {})
+        self.words = set(words) | set(self.aliases)
+        self.known_words = set(known_words) | self.words
+        self.deletes = {}
+        for word in sorted(self.words):
+            for variant in _deletes(word, max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+        # Per-token results, so repeated tokens cost one dictionary probe
+        self.correct = lru_cache(maxsize=cache_size)(self._correct)
+
+    def __len__(self):
+        return len(self.words)
+
+    def _correct(self, token):
+        """The indexed word token is (a misspelling of), else None"""
+        if token in self.known_words or len(token) < self.min_length:
+            return self.aliases.get(token, token) if token in self.words else None
+        best, best_distance, ambiguous = None, self.max_distance + 1, False
+        seen = set()
+        for variant in _deletes(token, self.max_distance):
+            for word in self.deletes.get(variant, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = edit_distance(token, word, self.max_distance)
+                if distance < best_distance:
+                    best, best_distance, ambiguous = word, distance, False
+                elif distance == best_distance and distance <= self.max_distance:
+                    ambiguous = True
+        return None if ambiguous or best is None else self.aliases.get(best, best)
+
+    def correct_tokens(self, text):
+        """Lowercased word tokens of text, each misspelling replaced by its indexed word"""
+        return [self.correct(token) or token for token in WORD_PATTERN.findall(text.lower())]
@@ -3,16 +3,42 @@ Visualization Script for Chatbot Architecture and Performance
 Generates charts for research paper/presentation
 """
 
+import argparse
+import glob
 import json
-import matplotlib.pyplot as plt
-import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Note: Run this after you have some chatbot_metrics_*.json files
+# Cross-session charts read from a MetricsStore, which parses each metrics file
+# only once. matplotlib, and the store (with NumPy), are imported inside the
+# functions that use them, so importing this module stays cheap
 
 
-def plot_metrics_from_file(filename):
+def _use_headless_backend():
+    """Switch matplotlib to the non-interactive Agg backend (no display needed)"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _finish_figure(fig, output_filename, dpi, show):
+    """Save a figure, then show it or release it"""
+    import matplotlib.pyplot as plt
+
+    plt.tight_layout()
+    fig.savefig(output_filename, dpi=dpi, bbox_inches='tight')
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+
+def plot_metrics_from_file(filename, output_filename=None, fmt='png', dpi=300, show=True):
     """Load and visualize metrics from a JSON file"""
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     with open(filename, 'r') as f:
         data = json.load(f)
     
@@ -88,33 +114,40 @@ def plot_metrics_from_file(filename):
                 ha='center', va='center', fontsize=12)
         ax4.set_title('Customer Satisfaction Distribution', fontweight='bold')
     
-    plt.tight_layout()
-    
     # Save the figure
-    output_filename = f"chatbot_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
+    if output_filename is None:
+        output_filename = f"chatbot_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    _finish_figure(fig, output_filename, dpi, show)
     print(f"✓ Chart saved as {output_filename}")
-    
-    plt.show()
+    return output_filename
+
 
+def _load_store(filenames=None, store=None):
+    """Open the metrics store and ingest any new or changed metrics files"""
+    from metrics_store import MetricsStore
+    store = store if store is not None else MetricsStore()
+    added = store.ingest(filenames if filenames is not None else glob.glob('chatbot_metrics_*.json'))
+    if added:
+        store.save()
+        print(f"✓ Indexed {added} new metrics file(s) ({len(store)} sessions in store)")
+    return store
 
-def compare_multiple_sessions(filenames):
+
+def compare_multiple_sessions(filenames, store=None, fmt='png', dpi=300, show=True):
     """Compare metrics across multiple sessions"""
-    sessions_data = []
-    
-    for filename in filenames:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            sessions_data.append(data['metrics'])
+    import matplotlib.pyplot as plt
+
+    store = _load_store(filenames, store)
+    sessions_data = store.sessions(filenames)
     
     # Create comparison charts
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(14, 10))
     fig.suptitle('Multi-Session Comparison Analysis', fontsize=16, fontweight='bold')
     
-    sessions = [f"Session {i+1}" for i in range(len(sessions_data))]
+    sessions = [f"Session {i+1}" for i in range(len(sessions_data['file']))]
     
     # 1. Satisfaction scores
-    satisfactions = [d['average_satisfaction'] for d in sessions_data]
+    satisfactions = sessions_data['average_satisfaction']
     ax1.bar(sessions, satisfactions, color='#4CAF50', alpha=0.7, edgecolor='black')
     ax1.set_title('Average Satisfaction Score', fontweight='bold')
     ax1.set_ylabel('Score (out of 5)')
@@ -123,7 +156,7 @@ def compare_multiple_sessions(filenames):
     ax1.set_ylim(0, 5)
     
     # 2. Escalation rates
-    escalation_rates = [d['escalation_rate'] * 100 for d in sessions_data]
+    escalation_rates = sessions_data['escalation_rate'] * 100
     ax2.bar(sessions, escalation_rates, color='#FF9800', alpha=0.7, edgecolor='black')
     ax2.set_title('Escalation Rate (%)', fontweight='bold')
     ax2.set_ylabel('Percentage')
@@ -131,53 +164,44 @@ def compare_multiple_sessions(filenames):
     ax2.legend()
     
     # 3. Response times
-    response_times = [d['average_response_time_ms'] for d in sessions_data]
+    response_times = sessions_data['average_response_time_ms']
     ax3.plot(sessions, response_times, marker='o', linewidth=2, markersize=8, color='#2196F3')
     ax3.set_title('Average Response Time', fontweight='bold')
     ax3.set_ylabel('Time (ms)')
     ax3.grid(True, alpha=0.3)
     
     # 4. Total interactions
-    interactions = [d['total_interactions'] for d in sessions_data]
+    interactions = sessions_data['total_interactions']
     ax4.bar(sessions, interactions, color='#9C27B0', alpha=0.7, edgecolor='black')
     ax4.set_title('Total Interactions per Session', fontweight='bold')
     ax4.set_ylabel('Count')
     
-    plt.tight_layout()
-    
     # Save comparison
-    output_filename = f"session_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-    plt.savefig(output_filename, dpi=300, bbox_inches='tight')
+    output_filename = f"session_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    _finish_figure(fig, output_filename, dpi, show)
     print(f"✓ Comparison chart saved as {output_filename}")
-    
-    plt.show()
 
 
-def generate_research_summary():
+def generate_research_summary(store=None, fmt='png', dpi=300, show=True):
     """Generate a summary table for research paper"""
-    import glob
-    
-    metrics_files = glob.glob('chatbot_metrics_*.json')
+    store = _load_store(store=store)
     
-    if not metrics_files:
+    if not len(store):
         print("⚠ No metrics files found. Run the chatbot first!")
         return
     
-    all_data = []
-    for file in metrics_files:
-        with open(file, 'r') as f:
-            all_data.append(json.load(f))
-    
     # Aggregate statistics
-    total_interactions = sum(d['metrics']['total_interactions'] for d in all_data)
-    avg_satisfaction = np.mean([d['metrics']['average_satisfaction'] for d in all_data if d['metrics']['average_satisfaction'] > 0])
-    avg_escalation = np.mean([d['metrics']['escalation_rate'] for d in all_data])
-    avg_response_time = np.mean([d['metrics']['average_response_time_ms'] for d in all_data])
+    summary = store.summary()
+    total_interactions = summary['total_interactions']
+    avg_satisfaction = summary['average_satisfaction']
+    avg_escalation = summary['average_escalation_rate']
+    avg_response_time = summary['average_response_time_ms']
+    sessions_analyzed = summary['sessions']
     
     print("\n" + "="*60)
     print("RESEARCH SUMMARY - AGGREGATE STATISTICS")
     print("="*60)
-    print(f"Total Sessions Analyzed: {len(all_data)}")
+    print(f"Total Sessions Analyzed: {sessions_analyzed}")
     print(f"Total Customer Interactions: {total_interactions}")
     print(f"Average Satisfaction Score: {avg_satisfaction:.2f}/5.0")
     print(f"Average Escalation Rate: {avg_escalation*100:.1f}%")
@@ -185,18 +209,20 @@ def generate_research_summary():
     print("="*60 + "\n")
     
     # Create summary visualization
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(1, 1, figsize=(10, 6))
     
     metrics_names = ['Satisfaction\n(out of 5)', 'Escalation\nRate (%)', 
                      'Response Time\n(ms)', 'Sessions\nAnalyzed']
-    metrics_values = [avg_satisfaction, avg_escalation*100, avg_response_time, len(all_data)]
+    metrics_values = [avg_satisfaction, avg_escalation*100, avg_response_time, sessions_analyzed]
     
     # Normalize for better visualization
     normalized = [
         avg_satisfaction / 5 * 100,  # Convert to percentage
         avg_escalation * 100,
         min(avg_response_time, 100),  # Cap at 100ms for viz
-        len(all_data) * 10  # Scale for visibility
+        sessions_analyzed * 10  # Scale for visibility
     ]
     
     bars = ax.barh(metrics_names, normalized, color=['#4CAF50', '#FF9800', '#2196F3', '#9C27B0'], alpha=0.7)
@@ -219,36 +245,149 @@ def generate_research_summary():
     ax.set_title('Research Summary - Key Performance Indicators', fontweight='bold', fontsize=14)
     ax.set_xlim(0, 120)
     
-    plt.tight_layout()
-    plt.savefig(f"research_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png", 
-                dpi=300, bbox_inches='tight')
+    _finish_figure(fig, f"research_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}", dpi, show)
     print("✓ Research summary chart saved")
-    plt.show()
 
 
-if __name__ == "__main__":
-    import glob
+def plot_daily_trends(store=None, fmt='png', dpi=300, show=True):
+    """Plot escalation, satisfaction, latency and intent trends per day"""
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    store = _load_store(store=store)
+    trends = store.daily_trends()
+    days, intents, intent_counts = store.intent_trends()
+    
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(14, 10))
+    fig.suptitle('Daily Trends Across Sessions', fontsize=16, fontweight='bold')
+    
+    # 1. Escalation rate
+    ax1.plot(days, trends['escalation_rate'] * 100, marker='o', linewidth=2, color='#FF9800')
+    ax1.axhline(y=15, color='g', linestyle='--', label='Target (10-20%)')
+    ax1.set_title('Escalation Rate (%)', fontweight='bold')
+    ax1.legend()
+    
+    # 2. Satisfaction
+    ax2.plot(days, trends['average_satisfaction'], marker='o', linewidth=2, color='#4CAF50')
+    ax2.axhline(y=4.0, color='r', linestyle='--', label='Target (4.0)')
+    ax2.set_title('Average Satisfaction Score', fontweight='bold')
+    ax2.set_ylim(0, 5)
+    ax2.legend()
+    
+    # 3. Response time
+    ax3.plot(days, trends['average_response_time_ms'], marker='o', linewidth=2, color='#2196F3', label='Average')
+    ax3.plot(days, trends['max_p99_response_time_ms'], marker='s', linestyle='--', color='#F44336', label='Worst p99')
+    ax3.set_title('Response Time (ms)', fontweight='bold')
+    ax3.grid(True, alpha=0.3)
+    ax3.legend()
+    
+    # 4. Intent volume (stacked)
+    colors = plt.cm.Set3(np.linspace(0, 1, max(1, len(intents))))
+    bottom = np.zeros(len(days))
+    for i, intent in enumerate(intents):
+        ax4.bar(days, intent_counts[:, i], bottom=bottom, color=colors[i], label=intent)
+        bottom += intent_counts[:, i]
+    ax4.set_title('Intents per Day', fontweight='bold')
+    ax4.set_ylabel('Count')
+    if intents:
+        ax4.legend(fontsize=8)
+    
+    fig.autofmt_xdate()
+    
+    output_filename = f"daily_trends_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    _finish_figure(fig, output_filename, dpi, show)
+    print(f"✓ Daily trends chart saved as {output_filename}")
+
+
+def _report_path(filename, output_dir, fmt):
+    base = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(output_dir, f"{base}_analysis.{fmt}")
+
+
+def _render_report(job):
+    filename, output_filename, fmt, dpi = job
+    return plot_metrics_from_file(filename, output_filename, fmt=fmt, dpi=dpi, show=False)
+
+
+def render_reports(filenames, output_dir='reports', fmt='png', dpi=300, workers=None, force=False):
+    """Render one report per metrics file headlessly, in a process pool.
+
+    Reports already newer than their metrics file are skipped unless force is
+    set. Only the pool's workers switch to the Agg backend, so the caller's
+    matplotlib backend (e.g. in an interactive session) is left alone, even
+    for a single report. Returns (rendered paths, number of skipped files).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    skipped = 0
+    for filename in filenames:
+        output_filename = _report_path(filename, output_dir, fmt)
+        if (not force and os.path.exists(output_filename)
+                and os.path.getmtime(output_filename) >= os.path.getmtime(filename)):
+            skipped += 1
+            continue
+        jobs.append((filename, output_filename, fmt, dpi))
+    
+    if not jobs:
+        return [], skipped
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_use_headless_backend) as pool:
+        rendered = list(pool.map(_render_report, jobs))
+    return rendered, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visualize chatbot metrics files")
+    parser.add_argument('files', nargs='*', help="metrics files (default: chatbot_metrics_*.json)")
+    parser.add_argument('--batch', action='store_true', help="render one report per file, headless and in parallel")
+    parser.add_argument('--output-dir', default='reports', help="where --batch writes reports")
+    parser.add_argument('--format', dest='fmt', default='png', help="image format, e.g. png, svg, pdf")
+    parser.add_argument('--dpi', type=int, default=300, help="raster resolution")
+    parser.add_argument('--workers', type=int, default=None, help="render processes for --batch (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="re-render reports that are already up to date")
+    parser.add_argument('--no-show', action='store_true', help="save charts without opening windows")
+    args = parser.parse_args()
     
     # Find all metrics files
-    metrics_files = glob.glob('chatbot_metrics_*.json')
+    metrics_files = args.files or glob.glob('chatbot_metrics_*.json')
     
     if not metrics_files:
         print("⚠ No metrics files found!")
         print("Run the chatbot first with: python chatbot.py")
         print("Then run this visualization script again.")
-    else:
-        print(f"Found {len(metrics_files)} metrics file(s)\n")
-        
-        # Visualize the most recent session
-        latest_file = max(metrics_files, key=lambda x: x.split('_')[2] + x.split('_')[3].replace('.json', ''))
-        print(f"Visualizing latest session: {latest_file}")
-        plot_metrics_from_file(latest_file)
-        
-        # If multiple sessions, create comparison
-        if len(metrics_files) > 1:
-            print(f"\nCreating comparison across {len(metrics_files)} sessions...")
-            compare_multiple_sessions(metrics_files)
-        
-        # Generate research summary
-        print("\nGenerating research summary...")
-        generate_research_summary()
+        return
+    
+    print(f"Found {len(metrics_files)} metrics file(s)\n")
+    
+    if args.batch:
+        rendered, skipped = render_reports(metrics_files, args.output_dir, args.fmt, args.dpi,
+                                           args.workers, args.force)
+        print(f"\n✓ Rendered {len(rendered)} report(s) to {args.output_dir} ({skipped} up to date)")
+        return
+    
+    show = not args.no_show
+    if not show:
+        _use_headless_backend()
+    
+    # Visualize the most recent session
+    latest_file = max(metrics_files, key=lambda x: os.path.basename(x).split('_')[2] + os.path.basename(x).split('_')[3].replace('.json', ''))
+    print(f"Visualizing latest session: {latest_file}")
+    plot_metrics_from_file(latest_file, fmt=args.fmt, dpi=args.dpi, show=show)
+    
+    # Ingest new metrics files into the store once, then reuse it
+    store = _load_store(metrics_files)
+    
+    # If multiple sessions, create comparison
+    if len(metrics_files) > 1:
+        print(f"\nCreating comparison across {len(metrics_files)} sessions...")
+        compare_multiple_sessions(metrics_files, store, args.fmt, args.dpi, show)
+        print("\nPlotting daily trends...")
+        plot_daily_trends(store, args.fmt, args.dpi, show)
+    
+    # Generate research summary
+    print("\nGenerating research summary...")
+    generate_research_summary(store, args.fmt, args.dpi, show)
+
+
+if __name__ == "__main__":
+    main()